@@ -0,0 +1,41 @@
+# Compares games per second of the warm container pool against one `docker run` per player per game.
+# Run from anywhere: python benchmarks/container-pool.py [games] [players]
+import os
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(root)
+sys.path.insert(0, root)
+
+import main
+
+
+# a real submission, the builtin testCode would not start any container
+program = "./examples/random-integers.py"
+
+
+def gamesPerSecond(games: int, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(games):
+        for _ in main.game([program] * n, main.MinK, main.MaxW):
+            pass
+    return games / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else main.MaxPlayerCount
+
+    main.USE_DOCKER = True
+
+    main.USE_CONTAINER_POOL = False
+    spawning = gamesPerSecond(games, n)
+    print(f"docker run per player: {spawning:.2f} games/s")
+
+    main.USE_CONTAINER_POOL = True
+    main.ContainerPoolWarm = {main.programImage(program): n}
+    # warm up, so the pool start is not part of the measurement
+    gamesPerSecond(1, n)
+    pooled = gamesPerSecond(games, n)
+    print(f"container pool:        {pooled:.2f} games/s ({pooled / spawning:.1f}x)")
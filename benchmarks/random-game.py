@@ -0,0 +1,52 @@
+# Shows that picking the match-up of /randomGame takes the same time no matter how many teams submitted.
+# Run from anywhere: python benchmarks/random-game.py
+import os
+import random
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(root)
+sys.path.insert(0, root)
+
+import main
+
+
+def legacyRandomMatchUp():
+    # the previous implementation, enumerating every seating to pick one
+    programs = main.submissionRegistry.programs()
+    n = random.randint(main.MinPlayerCount, min(main.MaxPlayerCount, len(programs)))
+    k = random.randint(main.MinK, main.MaxK)
+    w = random.randint(main.MinW, main.MaxW)
+    mu = random.choice(list(main.getAllMatchUpsWithFixedSize(programs, n)))
+    return n, k, w, mu
+
+
+def register(teams):
+    # fake submissions, the match-up only needs their paths
+    registry = main.submissionRegistry
+    with registry.lock:
+        for i in range(len(registry.submissions), teams):
+            registry.submissions[f"team{i}"] = main.Submission(f"team{i}", "python", f"{main.pyPath}team{i}.py", "0" * 64, 0.0)
+        registry.rebuild()
+
+
+def latency(f, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        f()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+if __name__ == "__main__":
+    with main.submissionRegistry.lock:
+        main.submissionRegistry.submissions = {}
+
+    print("teams   sampled (ms)   enumerated (ms)")
+    for teams in [2, 4, 6, 8, 10, 20, 50, 100, 500, 1000]:
+        register(teams)
+
+        sampled = latency(main.getRandomMatchUp, 1000)
+        # the enumeration is skipped once it would take minutes
+        enumerated = f"{latency(legacyRandomMatchUp, 3):15.3f}" if teams <= 10 else "        skipped"
+        print(f"{teams:5d}   {sampled:12.4f}   {enumerated}")
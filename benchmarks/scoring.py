@@ -0,0 +1,88 @@
+# Compares the batched NumPy round scoring (scoreRounds) with the per-game logic of game() on random moves,
+# checking that both produce the same outcome for every game.
+# Run from anywhere: python benchmarks/scoring.py [games]
+import os
+import random
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(root)
+sys.path.insert(0, root)
+
+import numpy as np
+
+import main
+
+# random moves end almost every game long before this, games still running are counted as draws by both sides
+ROUNDS = 100
+
+
+def randomGames(count):
+    rng = random.Random(0)
+    games = []
+    for _ in range(count):
+        n = rng.randint(main.MinPlayerCount, main.MaxPlayerCount)
+        k = rng.randint(main.MinK, main.MaxK)
+        w = rng.randint(main.MinW, main.MaxW)
+        games.append((n, k, w, [[rng.randint(1, k) for _ in range(n)] for _ in range(ROUNDS)]))
+    return games
+
+
+def perGame(games):
+    results = []
+    for n, k, w, moves in games:
+        scores = [0 for _ in range(n)]
+        result = (True, 0, 0, "Draw")
+        for submissions in moves:
+            main.scoreRound(scores, submissions)
+            ending = main.roundEnding(scores, w)
+            if ending is not None:
+                result = ending
+                break
+        results.append(result[1:3])
+    return results
+
+
+def asArrays(games):
+    moves = np.zeros((ROUNDS, len(games), main.MaxPlayerCount), dtype=np.int32)
+    for g, (n, k, w, rounds) in enumerate(games):
+        moves[:, g, :n] = rounds
+    return moves, np.array([game[2] for game in games])
+
+
+def batched(moves, w):
+    games = moves.shape[1]
+    scores = np.zeros((games, main.MaxPlayerCount), dtype=np.int32)
+    endings = np.zeros(games, dtype=np.int32)
+    winners = np.zeros(games, dtype=np.int32)
+    # finished games are dropped from the batch, so the long tail of draws doesn't cost a full batch per round
+    index = np.arange(games)
+    for submissions in moves:
+        finished, ending, winner = main.scoreRounds(scores, submissions[index], w)
+        endings[index[finished]] = ending[finished]
+        winners[index[finished]] = winner[finished]
+        running = ~finished
+        index, scores, w = index[running], scores[running], w[running]
+        if len(index) == 0:
+            break
+    return list(zip(endings.tolist(), winners.tolist()))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    games = randomGames(count)
+
+    start = time.perf_counter()
+    expected = perGame(games)
+    loop = time.perf_counter() - start
+
+    moves, w = asArrays(games)
+    start = time.perf_counter()
+    actual = batched(moves, w)
+    vectorized = time.perf_counter() - start
+
+    assert actual == expected, "batched scoring differs from game()"
+    print(f"{count} games, identical outcomes")
+    print(f"per game: {count / loop:12.0f} games/s")
+    print(f"batched:  {count / vectorized:12.0f} games/s ({loop / vectorized:.1f}x)")
@@ -1,22 +1,59 @@
+import asyncio
+import atexit
+import itertools
 import json
+import math
+import multiprocessing
 import os
+import queue
 import random
+import resource
+import secrets
+import selectors
+import shutil
+import signal
+import sqlite3
 import string
 import subprocess
 import sys
+import tempfile
 import threading
+import time
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from functools import cached_property, lru_cache
+from statistics import NormalDist
+from contextlib import aclosing, asynccontextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from hashlib import sha256
 from os import makedirs
-from random import shuffle
-from subprocess import Popen, PIPE
+from subprocess import Popen, PIPE, DEVNULL
 from typing import Annotated
 
 import uvicorn
-from fastapi import FastAPI, Form, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Form, UploadFile, File, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from pydantic import BaseModel
 from starlette.responses import StreamingResponse, JSONResponse
 
+try:
+    import numpy as np
+except ImportError:
+    # only needed for batched simulations (scoreRounds)
+    np = None
+
+try:
+    import brotli
+except ImportError:
+    # pages are served gzip compressed only
+    brotli = None
+
+try:
+    import inotify_simple
+except ImportError:
+    # the submission registry is only refreshed by uploads and team removals then
+    inotify_simple = None
+
 pyPath = "./python-submissions/"
 cppPath = "./cpp-submissions/"
 exePath = "./executable-submissions/"
@@ -26,7 +63,22 @@ teamsJsonPath = "./teams.json"
 adminPW = "".join([random.choice(string.ascii_letters + string.digits) for _ in range(8)])
 
 compileTimeout = 10
-testCode = "./examples/random-integers.py"
+# uploads larger than MaxUploadSize bytes are rejected (None: no limit): while the request is still streaming, the whole
+# form may be at most UploadFormOverhead bytes larger; accepted files are copied to disk in chunks of UploadChunkSize bytes
+MaxUploadSize = 64 * 1024 * 1024
+UploadFormOverhead = 64 * 1024
+UploadChunkSize = 1024 * 1024
+# uploads are compiled and tested by UploadWorkers background workers, the last UploadJobHistory finished jobs stay viewable
+UploadWorkers = 4
+UploadJobHistory = 200
+compileCommand = ["g++", "-std=c++20"]
+# compiled binaries are kept by the sha256 of their source and compileCommand, CompileWorkers compile at the same time
+compileCachePath = "./compile-cache/"
+CompileWorkers = 2
+testCode = "builtin:random-integers"
+# an upload is validated in this many games, ValidationWidth of them at the same time
+ValidationGames = 25
+ValidationWidth = 5
 
 MinPlayerCount = 2
 MaxPlayerCount = 6
@@ -39,9 +91,93 @@ MaxW = 20
 
 USE_DOCKER = True
 
+# time limits of a player: wall seconds per move (the first move may take StartupTimeLimit),
+# wall seconds spent waiting for it over a whole game and CPU seconds of its process
+MoveTimeLimit = 2
+StartupTimeLimit = 10
+GameTimeLimit = 60
+GameCpuLimit = 30
+TimeoutEnding = -2
+
+# programs that negotiate "protocol session" keep running between the games of a tournament,
+# at most SessionIdleLimit idle instances per program and SessionMaxGames games per instance
+USE_SESSIONS = True
+SessionIdleLimit = 8
+SessionMaxGames = 200
+
+# keeps sandbox containers running between games instead of one `docker run` per player per game
+USE_CONTAINER_POOL = True
+ContainerPoolSize = 48
+ContainerPoolWarm = {"python:3.13-slim": 6, "ubuntu:latest": 6}
+ContainerPoolIdleTimeout = 300
+ContainerPoolMaxUses = 100
+ContainerPoolInterval = 2
+ContainerStartTimeout = 30
+
+# number of games played at the same time during a tournament (None: derived from CPU count and ContainerPoolSize)
+TournamentWorkers = None
+TournamentQueueSize = 64
+# seconds between liveness checks of the tournament processes while waiting for them
+TournamentPollInterval = 1
+# > 0: spread the tournament workers over this many forked processes instead of threads of the web process
+TournamentProcesses = 0
+# play the games of a tournament as coroutines on one event loop (ignored if TournamentProcesses > 0)
+TournamentAsync = False
+TournamentAsyncWorkers = 256
+
+# which match-ups of a fixed size are played:
+# "permutations": every seating of every group, "combinations": every group in SeatRotations rotations (None: all n),
+# "sampled": random groups, so that every program plays about SampledGamesPerProgram games per n, k and w,
+# "adaptive": as many games as "sampled", but every group is picked from the current ratings (counting the games that
+# are queued but not rated yet) to be as close a contest as possible
+# "racing": rounds of about RacingGamesPerRound games per program, after every round the programs whose rating differs
+# significantly (at RacingConfidence) from every other one are settled and stop playing; at most RacingGameBudget games
+# (None: as many as "sampled")
+TournamentDesign = "combinations"
+TournamentDesigns = ("permutations", "combinations", "sampled", "adaptive", "racing")
+SeatRotations = None
+SampledGamesPerProgram = 12
+RacingGamesPerRound = 4
+RacingConfidence = 0.95
+RacingGameBudget = None
+# instead of every n and w at k = MinK, play SweepConfigurations (n, k, w) settings drawn from the full ranges
+# by a Latin hypercube, with SweepGameBudget games split evenly between them (groups are drawn like "sampled")
+TournamentSweep = False
+SweepConfigurations = 32
+SweepGameBudget = 3200
+
+# match-ups are shuffled through a buffer of this size, so the tournament plan is never materialized
+ShuffleBufferSize = 4096
+
+# every tournament game updates a rating (mu, sigma) of its players (Weng-Lin Plackett-Luce model, similar to TrueSkill),
+# /tournament reports mu ± RatingInterval * sigma
+RatingMu = 25.0
+RatingSigma = 25.0 / 3
+RatingBeta = 25.0 / 6
+RatingKappa = 0.0001
+RatingInterval = 1.96
+
+# moves of every tournament and random game are kept here (None: disabled)
+ReplayDatabasePath = "./replays.sqlite"
+
+# /tournament/stream pushes the changed standings at most every TournamentStreamInterval seconds,
+# an idle stream gets a keep-alive comment every TournamentStreamHeartbeat seconds
+TournamentStreamInterval = 0.5
+TournamentStreamHeartbeat = 15
+
+# refresh the submission registry when files in the submission directories are changed by hand (needs inotify_simple)
+WATCH_SUBMISSIONS = False
+
+# static pages and assets are read and compressed once, with DEV_MODE they are reloaded when their file changes
+DEV_MODE = False
+
+# finished games of the running tournament are appended here, so a restarted server can resume it (None: disabled)
+TournamentCheckpointPath = "./tournament.jsonl"
+
 makedirs(pyPath, exist_ok=True)
 makedirs(cppPath, exist_ok=True)
 makedirs(exePath, exist_ok=True)
+makedirs(compileCachePath, exist_ok=True)
 
 if not os.path.exists(teamsJsonPath):
     with open(teamsJsonPath, "w") as f:
@@ -50,9 +186,290 @@ if not os.path.exists(teamsJsonPath):
 with open(teamsJsonPath, "r") as f:
     teams = json.load(f)
 
-scores = {}
 muCount = 0
-playedGames = 0
+tournamentScheduler = None
+# programs of a racing tournament that stopped playing, with the number of games played when they were settled
+racingSettled = {}
+
+def programImage(path: str) -> str:
+    return "python:3.13-slim" if path.endswith(".py") else "ubuntu:latest"
+
+
+def programCommand(path: str, program: str) -> list[str]:
+    cmd = ["python", program] if path.endswith(".py") else [program]
+    if GameCpuLimit is not None:
+        # inside the container the CPU budget is enforced by the kernel, exceeding it kills the program with SIGXCPU;
+        # the pid is kept so that PooledContainer.renewCpuLimit can move both limits for every game of a session
+        limits = f"ulimit -S -t {GameCpuLimit}; ulimit -H -t {GameCpuLimit + 1}; echo $$ > /tmp/program.pid"
+        cmd = ["sh", "-c", f'{limits}; exec "$@"', "sh"] + cmd
+    return cmd + [f"#{os.path.basename(path)}"]
+
+
+def sessionCpuLimit() -> int:
+    # caps a whole session, a hard limit can't be raised again without privileges
+    return GameCpuLimit * SessionMaxGames + 1
+
+
+def limitCpu(pid: int, used: float = 0, session: bool = False) -> None:
+    if GameCpuLimit is not None and not USE_DOCKER:
+        # SIGXCPU at the soft limit, SIGKILL one second later; a program that may still negotiate a session keeps
+        # the hard limit of a whole session, then the referee checks the budget of every game itself (ProgramHandler.checkCpu)
+        limit = math.ceil(used) + GameCpuLimit
+        resource.prlimit(pid, resource.RLIMIT_CPU, (limit, sessionCpuLimit() if session else limit + 1))
+
+
+def processCpuTime(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def cpuExceeded(retcode) -> bool:
+    # killed directly (local process) or reported by docker exec as 128 + signal
+    return retcode in (-signal.SIGXCPU, 128 + signal.SIGXCPU)
+
+
+class PlayerTimeout(Exception):
+    pass
+
+
+def moveTimeout(used: float, first: bool) -> float:
+    return max(0.0, min(StartupTimeLimit if first else MoveTimeLimit, GameTimeLimit - used))
+
+
+class PooledContainer:
+    def __init__(self, image: str, pooled: bool) -> None:
+        self.image = image
+        self.pooled = pooled
+        self.uses = 0
+        self.lastUsed = time.monotonic()
+        self.staging = tempfile.mkdtemp(prefix="uicg-")
+        os.chmod(self.staging, 0o755)
+
+        # sleep runs as pid 1 so that `kill -9 -1` in reset() only hits the programs started by exec;
+        # --ipc none leaves no /dev/shm or message queues that could carry state over to the next team's program
+        try:
+            self.id = subprocess.run([
+                "docker", "run", "-d", "--rm",
+                "--network", "none", "--ipc", "none",
+                "--read-only", "--tmpfs", "/tmp",
+                "-v", f"{self.staging}:/app:ro",
+                image, "sleep", "infinity"
+            ], capture_output=True, text=True, check=True, timeout=ContainerStartTimeout).stdout.strip()
+        except Exception:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            raise
+
+    def bind(self, path: str) -> list[str]:
+        shutil.copy(path, os.path.join(self.staging, "program"))
+        self.uses += 1
+        return ["docker", "exec", "-i", self.id] + programCommand(path, "/app/program")
+
+    def reset(self) -> bool:
+        try:
+            subprocess.run(
+                ["docker", "exec", self.id, "sh", "-c", "kill -9 -1; rm -rf /tmp/* /tmp/.[!.]* /dev/shm/* /dev/shm/.[!.]* /dev/mqueue/*"],
+                stdout=DEVNULL, stderr=DEVNULL, timeout=ContainerStartTimeout, check=True
+            )
+            os.remove(os.path.join(self.staging, "program"))
+        except Exception:
+            return False
+        self.lastUsed = time.monotonic()
+        return True
+
+    def renewCpuLimit(self) -> None:
+        # soft limit = CPU seconds used so far (rounded up) + GameCpuLimit, hard limit one second later;
+        # raising the hard limit needs CAP_SYS_RESOURCE, which only this exec gets, not the program
+        script = (
+            'p=$(cat /tmp/program.pid); set -- $(cut -d")" -f2 /proc/$p/stat); '
+            'used=$(( (${12} + ${13}) / $(getconf CLK_TCK) + 1 )); '
+            f'prlimit --pid $p --cpu=$((used + {GameCpuLimit})):$((used + {GameCpuLimit + 1}))'
+        )
+        subprocess.run(["docker", "exec", "--privileged", self.id, "sh", "-c", script], stdout=DEVNULL, stderr=DEVNULL, timeout=ContainerStartTimeout, check=True)
+
+    def remove(self) -> None:
+        subprocess.run(["docker", "rm", "-f", self.id], stdout=DEVNULL, stderr=DEVNULL)
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+class ContainerPool:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.total = 0
+        self.maintainer = None
+        self.recycling = set()
+
+    def afterFork(self) -> None:
+        # a forked tournament process starts with an empty pool, the parent's containers stay with the parent
+        self.__init__()
+
+    def start(self) -> None:
+        with self.lock:
+            if self.maintainer is not None:
+                return
+            self.maintainer = threading.Thread(target=self.maintain, daemon=True)
+            self.maintainer.start()
+
+    def checkout(self, image: str) -> PooledContainer:
+        self.start()
+        with self.lock:
+            idle = self.idle.get(image)
+            if idle:
+                return idle.pop()
+            # once the pool is full, overflow containers are started for a single game and removed afterwards
+            pooled = self.total < ContainerPoolSize
+            if pooled:
+                self.total += 1
+        try:
+            return PooledContainer(image, pooled)
+        except Exception:
+            if pooled:
+                with self.lock:
+                    self.total -= 1
+            raise
+
+    def release(self, container: PooledContainer) -> None:
+        t = threading.Thread(target=self.recycle, args=(container,), daemon=True)
+        with self.lock:
+            self.recycling.add(t)
+        t.start()
+
+    def recycle(self, container: PooledContainer) -> None:
+        try:
+            self.recycleContainer(container)
+        finally:
+            with self.lock:
+                self.recycling.discard(threading.current_thread())
+
+    def recycleContainer(self, container: PooledContainer) -> None:
+        if container.pooled and container.uses < ContainerPoolMaxUses and container.reset():
+            with self.lock:
+                self.idle.setdefault(container.image, []).append(container)
+            return
+        container.remove()
+        if container.pooled:
+            with self.lock:
+                self.total -= 1
+
+    def maintain(self) -> None:
+        while True:
+            evicted = []
+            missing = []
+            now = time.monotonic()
+            with self.lock:
+                for image, idle in self.idle.items():
+                    # idle lists are ordered by last use, so the oldest containers are evicted first
+                    while len(idle) > ContainerPoolWarm.get(image, 0) and now - idle[0].lastUsed > ContainerPoolIdleTimeout:
+                        evicted.append(idle.pop(0))
+                self.total -= len(evicted)
+                for image, warm in ContainerPoolWarm.items():
+                    count = min(warm - len(self.idle.get(image, [])), ContainerPoolSize - self.total)
+                    if count > 0:
+                        missing += [image] * count
+                        self.total += count
+
+            for container in evicted:
+                container.remove()
+            for image in missing:
+                try:
+                    container = PooledContainer(image, True)
+                except Exception as e:
+                    print(f"Could not start a {image} container for the pool: {e}")
+                    with self.lock:
+                        self.total -= 1
+                    continue
+                with self.lock:
+                    self.idle.setdefault(image, []).append(container)
+
+            time.sleep(ContainerPoolInterval)
+
+    def shutdown(self) -> None:
+        with self.lock:
+            recycling = list(self.recycling)
+        for t in recycling:
+            t.join(ContainerStartTimeout)
+        with self.lock:
+            containers = [c for idle in self.idle.values() for c in idle]
+            self.idle = {}
+        for container in containers:
+            container.remove()
+
+
+containerPool = ContainerPool()
+atexit.register(containerPool.shutdown)
+os.register_at_fork(after_in_child=containerPool.afterFork)
+
+
+def programLaunch(path: str):
+    if not USE_DOCKER:
+        if path.endswith(".py"):
+            return [sys.executable, path], None
+        return [path], None
+
+    if USE_CONTAINER_POOL:
+        container = containerPool.checkout(programImage(path))
+        try:
+            return container.bind(path), container
+        except Exception:
+            containerPool.release(container)
+            raise
+
+    return [
+        "docker", "run", "--rm", "-i", "--init",
+        "--network", "none",
+        "-v", f"{os.path.abspath(path)}:/app/program:ro",
+        programImage(path),
+    ] + programCommand(path, "/app/program"), None
+
+
+def parseOutput(path: str, k: int, result: str) -> int:
+    resInt = -1
+    try:
+        resInt = int(result.strip())
+    except:
+        pass
+    if 1 <= resInt <= k:
+        return resInt
+    else:
+        raise Exception(f"{result.strip()} is no valid output")
+
+
+def parseMove(path: str, k: int, move: int) -> int:
+    if 1 <= move <= k:
+        return move
+    raise Exception(f"{move} is no valid output")
+
+
+class EncodedRound:
+    # the submissions of a round are formatted once and then written to every player
+    def __init__(self, submissions: list[int]) -> None:
+        self.submissions = submissions
+
+    @cached_property
+    def text(self) -> bytes:
+        return (" ".join(map(str, self.submissions)) + "\n").encode()
+
+    @cached_property
+    def frame(self) -> bytes:
+        return bytes(self.submissions)
+
+
+def negotiateProtocol(handler, line: str) -> None:
+    # instead of its first move a program may answer "protocol <options>", e.g. "protocol binary":
+    # then every move is a single byte and every round is sent as n bytes, without separators or linebreaks
+    # with "session" the program isn't stopped after a game: it gets "end" (binary: n zero bytes) instead of
+    # the submissions of a round and then the initial line of its next game
+    for option in line.split()[1:]:
+        if option == "binary":
+            handler.binary = True
+        elif option == "session":
+            handler.session = True
+        else:
+            raise Exception(f"Unknown protocol option {option}")
+    handler.negotiated = True
+
 
 class ProgramHandler:
     def __init__(self, path: str, n: int, k: int, w: int, j: int) -> None:
@@ -61,207 +478,1165 @@ class ProgramHandler:
         self.k = k
         self.w = w
         self.j = j
+        self.container = None
+        self.buffer = b""
+        self.eof = False
+        self.used = 0.0
+        self.moves = 0
+        self.binary = False
+        self.negotiated = False
+        self.session = False
+        self.broken = False
+        self.pendingMove = True
+        self.games = 1
+        self.cpuStart = 0.0
+
+        cmd, self.container = programLaunch(path)
 
-        cmd = [
-            "docker", "run", "--rm", "-i", "--init",
-            "--network", "none",
-            "-v", f"{os.path.abspath(path)}:/app/program:ro",
-            ("python:3.13-slim" if path.endswith(".py") else "ubuntu:latest"),
-            ("python" if path.endswith(".py") else "/app/program")
-        ]
-
-        if path.endswith(".py"):
-            cmd.append("/app/program")
-
-        cmd.append(f"#{os.path.basename(path)}")
-
-        if not USE_DOCKER:
-            if path.endswith(".py"):
-                cmd = [sys.executable, path]
-            else:
-                cmd = [path]
-
-        self.p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, text=True, bufsize=1)
+        try:
+            self.p = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, bufsize=0)
+            limitCpu(self.p.pid, session=USE_SESSIONS)
+        except Exception:
+            self.close()
+            raise
 
         # Send initial input
-        self.p.stdin.write(f"{n} {k} {w} {j}\n")
-        self.p.stdin.flush()
+        self.p.stdin.write(f"{n} {k} {w} {j}\n".encode())
 
-    def sendSubmissions(self, g: list[int]) -> None:
-        self.p.stdin.write(" ".join(map(str, g)) + "\n")
-        self.p.stdin.flush()
+    def fileno(self) -> int:
+        return self.p.stdout.fileno()
 
-    def getOutput(self) -> int:
-        result = self.p.stdout.readline()
-        if result == "":
-            # Check if the process died
-            retcode = self.p.poll()
-            if retcode is not None:
-                err = self.p.stderr.read()
-                raise Exception(f"Subprocess {self.path} exited with code {retcode}.\nStderr:\n{err}")
-            else:
-                raise Exception(f"No output received from subprocess {self.path}")
-        resInt = -1
-        try:
-            resInt = int(result.strip())
-        except:
-            pass
-        if 1 <= resInt <= self.k:
-            return resInt
-        else:
-            raise Exception(f"{result.strip()} is no valid output")
+    def sendSubmissions(self, r: EncodedRound) -> None:
+        self.p.stdin.write(r.frame if self.binary else r.text)
+        self.pendingMove = True
 
-    def __del__(self):
+    def restart(self, n: int, k: int, w: int, j: int) -> None:
+        self.n = n
+        self.k = k
+        self.w = w
+        self.j = j
+        self.used = 0.0
+        self.moves = 0
+        self.games += 1
+        # the CPU budget of a session is renewed for every game
+        if GameCpuLimit is not None and self.container is not None:
+            self.container.renewCpuLimit()
+        elif not USE_DOCKER:
+            self.cpuStart = processCpuTime(self.p.pid)
+            limitCpu(self.p.pid, self.cpuStart, session=True)
+        self.p.stdin.write(f"{n} {k} {w} {j}\n".encode())
+        self.pendingMove = True
+
+    def finishGame(self) -> bool:
+        if not self.session or self.broken or self.games >= SessionMaxGames or self.p.poll() is not None:
+            return False
+        if USE_DOCKER and GameCpuLimit is not None and self.container is None:
+            # without a pooled container the CPU budget can't be renewed, so the session would share one budget
+            return False
+        try:
+            self.p.stdin.write(bytes(self.n) if self.binary else b"end\n")
+            # the program already answers the round that will never be played, that move is dropped
+            deadline = time.monotonic() + MoveTimeLimit
+            while self.pendingMove:
+                if self.takeOutput() is not None:
+                    self.pendingMove = False
+                elif time.monotonic() > deadline:
+                    return False
+                else:
+                    with selectors.DefaultSelector() as selector:
+                        selector.register(self.fileno(), selectors.EVENT_READ)
+                        if selector.select(deadline - time.monotonic()):
+                            self.fill()
+        except Exception:
+            return False
+        return self.buffer == b""
+
+    def fill(self) -> None:
+        data = os.read(self.fileno(), 65536)
+        if data == b"":
+            self.eof = True
+        self.buffer += data
+
+    def takeOutput(self):
+        if self.binary:
+            if not self.buffer:
+                return self.died() if self.eof else None
+            move = self.buffer[0]
+            self.buffer = self.buffer[1:]
+            self.moves += 1
+            self.pendingMove = False
+            self.checkCpu()
+            return parseMove(self.path, self.k, move)
+
+        line, sep, rest = self.buffer.partition(b"\n")
+        if not sep:
+            return self.died() if self.eof else None
+        self.buffer = rest
+        if self.moves == 0 and not self.negotiated and line.startswith(b"protocol"):
+            negotiateProtocol(self, line.decode(errors="replace"))
+            return self.takeOutput()
+        self.moves += 1
+        self.pendingMove = False
+        self.checkCpu()
+        return parseOutput(self.path, self.k, line.decode(errors="replace"))
+
+    def checkCpu(self) -> None:
+        # as long as the hard limit is the one of a whole session (before the first move, or for a session), the kernel
+        # doesn't stop a program that ignores SIGXCPU, so the referee stops it after GameCpuLimit CPU seconds of a game
+        if GameCpuLimit is None or USE_DOCKER or not USE_SESSIONS or (not self.session and self.moves > 1):
+            return
+        if processCpuTime(self.p.pid) - self.cpuStart > GameCpuLimit:
+            self.broken = True
+            self.p.kill()
+            raise PlayerTimeout(f"Subprocess {self.path} exceeded its CPU time limit of {GameCpuLimit} seconds")
+        if not self.session:
+            # no session, so the hard limit goes down to one second after the soft limit
+            limitCpu(self.p.pid)
+
+    def died(self):
+        # Check if the process died
+        try:
+            retcode = self.p.wait(1)
+        except subprocess.TimeoutExpired:
+            raise Exception(f"No output received from subprocess {self.path}")
+        if cpuExceeded(retcode):
+            raise PlayerTimeout(f"Subprocess {self.path} exceeded its CPU time limit of {GameCpuLimit} seconds")
+        err = self.p.stderr.read().decode(errors="replace")
+        raise Exception(f"Subprocess {self.path} exited with code {retcode}.\nStderr:\n{err}")
+
+    def close(self):
         try:
             self.p.terminate()
             # self.p.kill()
         except Exception:
             pass
+        if self.container is not None:
+            containerPool.release(self.container)
+            self.container = None
+
+    def __del__(self):
+        self.close()
+
+
+def readRound(programs: list[ProgramHandler], selector) -> list:
+    # waits for the moves of all players at once, every player only gets its own time budget
+    start = time.monotonic()
+    results = [None for _ in programs]
+    deadlines = {}
+    for i, p in enumerate(programs):
+        try:
+            results[i] = p.takeOutput()
+        except Exception as e:
+            results[i] = e
+        if results[i] is None:
+            deadlines[i] = start + moveTimeout(p.used, p.moves == 0)
+
+    while deadlines:
+        now = time.monotonic()
+        for i in [i for i, d in deadlines.items() if d <= now]:
+            p = programs[i]
+            results[i] = PlayerTimeout(f"Subprocess {p.path} took longer than {deadlines.pop(i) - start:.1f} seconds to answer")
+        if not deadlines:
+            break
+
+        for key, _ in selector.select(min(deadlines.values()) - now):
+            i = key.data
+            p = programs[i]
+            p.fill()
+            if p.eof:
+                selector.unregister(key.fileobj)
+            if i in deadlines:
+                try:
+                    results[i] = p.takeOutput()
+                except Exception as e:
+                    results[i] = e
+                if results[i] is not None:
+                    del deadlines[i]
+                    p.used += time.monotonic() - start
+
+    return results
+
+
+class AsyncProgramHandler:
+    def __init__(self, path: str, n: int, k: int, w: int, j: int) -> None:
+        self.path = path
+        self.n = n
+        self.k = k
+        self.w = w
+        self.j = j
+        self.container = None
+        self.p = None
+        self.used = 0.0
+        self.moves = 0
+        self.binary = False
+        self.negotiated = False
+        # sessions are only reused by game(), here the program is stopped after every game
+        self.session = False
+
+    async def start(self) -> None:
+        # checking out a pooled container may start one, which must not block the event loop
+        cmd, self.container = await asyncio.to_thread(programLaunch, self.path)
+        self.p = await asyncio.create_subprocess_exec(*cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        limitCpu(self.p.pid)
+
+        # Send initial input
+        self.p.stdin.write(f"{self.n} {self.k} {self.w} {self.j}\n".encode())
+        await self.p.stdin.drain()
+
+    async def sendSubmissions(self, r: EncodedRound) -> None:
+        self.p.stdin.write(r.frame if self.binary else r.text)
+        await self.p.stdin.drain()
+
+    async def readMove(self) -> bytes:
+        while True:
+            if self.binary:
+                return await self.p.stdout.read(1)
+            line = await self.p.stdout.readline()
+            if self.moves == 0 and not self.negotiated and line.startswith(b"protocol"):
+                negotiateProtocol(self, line.decode(errors="replace"))
+                continue
+            return line
+
+    async def getOutput(self) -> int:
+        timeout = moveTimeout(self.used, self.moves == 0)
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.readMove(), timeout)
+        except asyncio.TimeoutError:
+            raise PlayerTimeout(f"Subprocess {self.path} took longer than {timeout:.1f} seconds to answer")
+        self.used += time.monotonic() - start
+        self.moves += 1
+        if result == b"":
+            # Check if the process died
+            try:
+                retcode = await asyncio.wait_for(self.p.wait(), 1)
+            except asyncio.TimeoutError:
+                raise Exception(f"No output received from subprocess {self.path}")
+            if cpuExceeded(retcode):
+                raise PlayerTimeout(f"Subprocess {self.path} exceeded its CPU time limit of {GameCpuLimit} seconds")
+            err = (await self.p.stderr.read()).decode(errors="replace")
+            raise Exception(f"Subprocess {self.path} exited with code {retcode}.\nStderr:\n{err}")
+        if self.binary:
+            return parseMove(self.path, self.k, result[0])
+        return parseOutput(self.path, self.k, result.decode(errors="replace"))
+
+    async def close(self) -> None:
+        # the process is awaited, so its transport is closed and it is reaped right away instead of by the garbage collector
+        if self.p is not None and self.p.returncode is None:
+            try:
+                self.p.terminate()
+                await asyncio.wait_for(self.p.wait(), 1)
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
+                self.p.kill()
+                await self.p.wait()
+        if self.container is not None:
+            containerPool.release(self.container)
+            self.container = None
+
+
+class Strategy:
+    # in-process player for trusted reference bots, it plays without a process or container
+    def __init__(self, n: int, k: int, w: int, j: int) -> None:
+        self.n = n
+        self.k = k
+        self.w = w
+        self.j = j
+
+    def move(self, previous: list[int]) -> int:
+        # previous holds the submissions of the last round (empty in the first round);
+        # by default it plays like examples/random-integers.py, subclasses override this
+        return random.randint(1, self.k)
+
+
+class AlwaysHigh(Strategy):
+    def move(self, previous: list[int]) -> int:
+        return self.k
+
+
+# in-process players are seated with the path "builtin:<name>", any callable taking (n, k, w, j) and
+# returning an object with a move method can be registered
+BuiltinPrefix = "builtin:"
+builtinStrategies = {
+    "random-integers": Strategy,
+    "always-high": AlwaysHigh,
+}
+
+
+class InProcessHandler:
+    def __init__(self, path: str, n: int, k: int, w: int, j: int) -> None:
+        self.path = path
+        self.n = n
+        self.k = k
+        self.w = w
+        self.j = j
+        self.used = 0.0
+        self.moves = 0
+        self.previous = []
+
+        name = path.removeprefix(BuiltinPrefix)
+        if name not in builtinStrategies:
+            raise Exception(f"There is no builtin strategy {name}")
+        self.strategy = builtinStrategies[name](n, k, w, j)
+
+    def fileno(self):
+        return None
+
+    def sendSubmissions(self, r: EncodedRound) -> None:
+        self.previous = list(r.submissions)
+
+    def takeOutput(self) -> int:
+        move = self.strategy.move(self.previous)
+        self.moves += 1
+        if isinstance(move, int) and 1 <= move <= self.k:
+            return move
+        raise Exception(f"{move} is no valid output")
+
+    def close(self) -> None:
+        pass
 
 
-def game(paths: list[str], k: int, w: int):
+class AsyncInProcessHandler(InProcessHandler):
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def sendSubmissions(self, r: EncodedRound) -> None:
+        InProcessHandler.sendSubmissions(self, r)
+
+    async def getOutput(self) -> int:
+        return self.takeOutput()
+
+
+def isBuiltin(path: str) -> bool:
+    return path.startswith(BuiltinPrefix)
+
+
+def scoreRound(scores: list[int], submissions: list[int]) -> None:
+    submissionCounts = {}
+
+    for submission in submissions:
+        if submission not in submissionCounts:
+            submissionCounts[submission] = 1
+        else:
+            submissionCounts[submission] += 1
+
+    for i, s in enumerate(submissions):
+        if submissionCounts[s] <= 1:
+            scores[i] += s
+
+
+def roundEnding(scores: list[int], w: int):
+    for i, s in enumerate(scores):
+        if s != 0 and s % w == 0:
+            for j, t in enumerate(scores[i+1:]):
+                if t != 0 and t % w == 0:
+                    return True, 0, 0, "Draw by foto finish"
+            return True, 1, i, "Win"
+    return None
+
+
+def scoreRounds(scores, submissions, w, active=None):
+    # one round of many games at once: scores and submissions are integer arrays shaped (games, players),
+    # seats of games with fewer players hold the submission 0, w is shaped (games,)
+    # scores is updated in place, returns the finished, ending and winner arrays (like roundEnding)
+    if np is None:
+        raise RuntimeError("scoreRounds needs numpy")
+    seated = submissions > 0
+    if active is None:
+        active = np.ones(len(scores), dtype=bool)
+
+    same = (submissions[:, :, None] == submissions[:, None, :]) & seated[:, None, :]
+    unique = (same.sum(axis=2) == 1) & seated & active[:, None]
+    scores += submissions * unique
+
+    hit = (scores != 0) & (scores % np.asarray(w)[:, None] == 0)
+    hits = hit.sum(axis=1)
+    finished = active & (hits > 0)
+    # a second player reaching a multiple of w in the same round is a foto finish
+    ending = np.where(hits == 1, 1, 0)
+    winner = np.where(hits == 1, hit.argmax(axis=1), 0)
+    return finished, ending, winner
+
+
+class SessionPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def acquire(self, path: str, n: int, k: int, w: int, j: int):
+        if isBuiltin(path):
+            return InProcessHandler(path, n, k, w, j)
+        while True:
+            with self.lock:
+                idle = self.idle.get(path)
+                handler = idle.pop() if idle else None
+            if handler is None:
+                return ProgramHandler(path, n, k, w, j)
+            try:
+                handler.restart(n, k, w, j)
+                return handler
+            except Exception:
+                handler.close()
+
+    def release(self, handler) -> None:
+        if isinstance(handler, ProgramHandler) and handler.finishGame():
+            with self.lock:
+                idle = self.idle.setdefault(handler.path, [])
+                if len(idle) < SessionIdleLimit:
+                    idle.append(handler)
+                    return
+        handler.close()
+
+    def clear(self) -> None:
+        with self.lock:
+            handlers = [h for idle in self.idle.values() for h in idle]
+            self.idle = {}
+        for handler in handlers:
+            handler.close()
+
+
+def releasePrograms(programs, sessions) -> None:
+    while programs:
+        p = programs.pop()
+        if sessions is not None:
+            sessions.release(p)
+        else:
+            p.close()
+
+
+def game(paths: list[str], k: int, w: int, cancel: threading.Event = None, sessions: SessionPool = None):
     n = len(paths)
     programs = []
     for i, p in enumerate(paths):
         try:
-            programs.append(ProgramHandler(p, n, k, w, i))
+            if sessions is not None:
+                programs.append(sessions.acquire(p, n, k, w, i))
+            else:
+                programs.append((InProcessHandler if isBuiltin(p) else ProgramHandler)(p, n, k, w, i))
         except Exception as e:
-            while programs:
-                del programs[0]
+            releasePrograms(programs, sessions)
             yield True, -1, i, "Initialisation error: " + str(e)
             return
 
+    selector = selectors.DefaultSelector()
+    for i, p in enumerate(programs):
+        if p.fileno() is not None:
+            selector.register(p.fileno(), selectors.EVENT_READ, i)
+
     scores = [0 for _ in programs]
     submissions = [0 for _ in programs]
 
-    for _ in range(1000):
-        for i, p in enumerate(programs):
-            try:
-                submissions[i] = p.getOutput()
-            except Exception as e:
-                while programs:
-                    del programs[0]
-                yield True, -1, i, "Error reading output of the program: " + str(e)
+    try:
+        for _ in range(1000):
+            if cancel is not None and cancel.is_set():
+                yield True, 0, 0, "Cancelled"
+                return
+
+            for i, result in enumerate(readRound(programs, selector)):
+                if isinstance(result, Exception):
+                    programs[i].broken = True
+                if isinstance(result, PlayerTimeout):
+                    yield True, TimeoutEnding, i, "Timeout: " + str(result)
+                    return
+                if isinstance(result, Exception):
+                    yield True, -1, i, "Error reading output of the program: " + str(result)
+                    return
+                submissions[i] = result
+
+            encoded = EncodedRound(submissions)
+            for i, p in enumerate(programs):
+                try:
+                    p.sendSubmissions(encoded)
+                except Exception as e:
+                    p.broken = True
+                    yield True, -1, i, "Error passing the input to program: " + str(e)
+                    return
+
+            scoreRound(scores, submissions)
+
+            yield False, scores, submissions, "current game state"
+
+            ending = roundEnding(scores, w)
+            if ending is not None:
+                yield ending
                 return
 
-        for i, p in enumerate(programs):
+        yield True, 0, 0, "Draw"
+    finally:
+        selector.close()
+        releasePrograms(programs, sessions)
+
+
+async def asyncGame(paths: list[str], k: int, w: int, cancel: threading.Event = None):
+    n = len(paths)
+    programs = []
+
+    try:
+        for i, p in enumerate(paths):
             try:
-                p.sendSubmissions(submissions)
+                programs.append((AsyncInProcessHandler if isBuiltin(p) else AsyncProgramHandler)(p, n, k, w, i))
             except Exception as e:
-                while programs:
-                    del programs[0]
-                yield True, -1, i, "Error passing the input to program: " + str(e)
+                yield True, -1, i, "Initialisation error: " + str(e)
                 return
 
-        submissionCounts = {}
+        started = await asyncio.gather(*(p.start() for p in programs), return_exceptions=True)
+        for i, result in enumerate(started):
+            if isinstance(result, Exception):
+                yield True, -1, i, "Initialisation error: " + str(result)
+                return
 
-        for submission in submissions:
-            if submission not in submissionCounts:
-                submissionCounts[submission] = 1
-            else:
-                submissionCounts[submission] += 1
-
-        for i, s in enumerate(submissions):
-            if submissionCounts[s] <= 1:
-                scores[i] += s
-
-        yield False, scores, submissions, "current game state"
-
-        for i, s in enumerate(scores):
-            if s != 0 and s % w == 0:
-                while programs:
-                    del programs[0]
-                for j, t in enumerate(scores[i+1:]):
-                    if t != 0 and t % w == 0:
-                        yield True, 0, 0, "Draw by foto finish"
-                        return
-                yield True, 1, i, "Win"
+        scores = [0 for _ in programs]
+
+        for _ in range(1000):
+            if cancel is not None and cancel.is_set():
+                yield True, 0, 0, "Cancelled"
                 return
 
+            # all players of a round are waited for at the same time instead of one after another
+            submissions = await asyncio.gather(*(p.getOutput() for p in programs), return_exceptions=True)
+            for i, result in enumerate(submissions):
+                if isinstance(result, PlayerTimeout):
+                    yield True, TimeoutEnding, i, "Timeout: " + str(result)
+                    return
+                if isinstance(result, Exception):
+                    yield True, -1, i, "Error reading output of the program: " + str(result)
+                    return
+
+            encoded = EncodedRound(submissions)
+            sent = await asyncio.gather(*(p.sendSubmissions(encoded) for p in programs), return_exceptions=True)
+            for i, result in enumerate(sent):
+                if isinstance(result, Exception):
+                    yield True, -1, i, "Error passing the input to program: " + str(result)
+                    return
+
+            scoreRound(scores, submissions)
+
+            yield False, scores, submissions, "current game state"
+
+            ending = roundEnding(scores, w)
+            if ending is not None:
+                yield ending
+                return
 
-    while programs:
-        del programs[0]
+        yield True, 0, 0, "Draw"
+    finally:
+        await asyncio.gather(*(p.close() for p in programs))
 
-    yield True, 0, 0, "Draw"
-    return
 
+class MoveRecorder:
+    def __init__(self, k: int) -> None:
+        # moves are 1..k, so two of them fit in one byte as long as k < 16
+        self.bits = 4 if k < 16 else 8
+        self.data = bytearray()
+        self.half = None
+        self.rounds = 0
 
-def testProgram(path: str):
-    for i in range(25):
+    def add(self, submissions: list[int]) -> None:
+        self.rounds += 1
+        if self.bits == 8:
+            self.data += bytes(submissions)
+            return
+        for s in submissions:
+            if self.half is None:
+                self.half = s
+            else:
+                self.data.append(self.half << 4 | s)
+                self.half = None
+
+    def moves(self) -> bytes:
+        if self.half is None:
+            return bytes(self.data)
+        return bytes(self.data) + bytes([self.half << 4])
+
+
+def decodeMoves(moves: bytes, n: int, rounds: int, bits: int):
+    if bits == 8:
+        values = iter(moves)
+    else:
+        values = (b >> shift & 15 for b in moves for shift in (4, 0))
+    for _ in range(rounds):
+        yield [next(values) for _ in range(n)]
+
+
+class ReplayStore:
+    def __init__(self, path):
+        self.path = path
+        self.updates = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.writer = None
+        self.ids = None
+
+    def connect(self):
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS games (id INTEGER PRIMARY KEY, n INTEGER, k INTEGER, w INTEGER, rounds INTEGER, bits INTEGER, moves BLOB, ending INTEGER, winner INTEGER, message TEXT, time REAL)")
+        db.execute("CREATE TABLE IF NOT EXISTS players (game INTEGER, seat INTEGER, team TEXT, PRIMARY KEY (game, seat))")
+        db.execute("CREATE INDEX IF NOT EXISTS games_nkw ON games (n, k, w)")
+        db.execute("CREATE INDEX IF NOT EXISTS players_team ON players (team, game)")
+        return db
+
+    def start(self):
+        with self.lock:
+            if self.writer is not None:
+                return
+            db = self.connect()
+            # ids are handed out right away, so callers don't have to wait for the writer
+            self.ids = itertools.count((db.execute("SELECT MAX(id) FROM games").fetchone()[0] or 0) + 1)
+            db.close()
+            self.writer = threading.Thread(target=self.write, daemon=True)
+            self.writer.start()
+
+    def save(self, mu, k, w, recorder, ending, winner, message):
+        self.start()
+        with self.lock:
+            ID = next(self.ids)
+        teams = [os.path.basename(f).removesuffix(".py") for f in mu]
+        self.updates.put((ID, teams, k, w, recorder.rounds, recorder.bits, recorder.moves(), ending, winner, message, time.time()))
+        return ID
+
+    def write(self):
+        db = self.connect()
+        while True:
+            batch = [self.updates.get()]
+            try:
+                while True:
+                    batch.append(self.updates.get_nowait())
+            except queue.Empty:
+                pass
+            # one transaction per batch keeps the commits off the games' critical path
+            try:
+                with db:
+                    for ID, teams, k, w, rounds, bits, moves, ending, winner, message, t in batch:
+                        db.execute("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (ID, len(teams), k, w, rounds, bits, moves, ending, winner, message, t))
+                        db.executemany("INSERT INTO players VALUES (?, ?, ?)", [(ID, seat, team) for seat, team in enumerate(teams)])
+            except sqlite3.Error as e:
+                # the batch is lost, but the writer keeps going, otherwise every later replay would queue up forever
+                print(f"Replays {batch[0][0]} to {batch[-1][0]} could not be saved: {e!r}")
+
+    def load(self, ID):
+        db = self.connect()
+        try:
+            row = db.execute("SELECT n, k, w, rounds, bits, moves, ending, winner, message FROM games WHERE id = ?", (ID,)).fetchone()
+            if row is None:
+                return None
+            teams = [team for team, in db.execute("SELECT team FROM players WHERE game = ? ORDER BY seat", (ID,))]
+        finally:
+            db.close()
+        return teams, row
+
+    def search(self, team=None, n=None, k=None, w=None, limit=100):
+        query = "SELECT id, n, k, w, rounds, ending, winner, message, time FROM games WHERE 1"
+        params = []
+        if team is not None:
+            query += " AND id IN (SELECT game FROM players WHERE team = ?)"
+            params.append(team)
+        for column, value in (("n", n), ("k", k), ("w", w)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        db = self.connect()
         try:
-            n = random.randint(MinPlayerCount, MaxPlayerCount)
-            k = random.randint(MinK, MaxK)
-            w = random.randint(MinW, MaxW)
-            j = random.randrange(0, n)
+            return [
+                {"id": r[0], "n": r[1], "k": r[2], "w": r[3], "rounds": r[4], "ending": r[5], "winner": r[6], "value": r[7], "time": r[8]}
+                for r in db.execute(query, params)
+            ]
+        finally:
+            db.close()
 
-            paths = [(path if i == j else testCode) for i in range(n)]
 
-            outcome, program, value = None, None, None
-            for cs in game(paths, k, w):
-                _, outcome, program, value = cs
+replayStore = ReplayStore(ReplayDatabasePath) if ReplayDatabasePath is not None else None
 
-            if outcome == -1:
-                yield False, value
-            else:
-                yield True, (i + 1) * 4
 
-        except Exception as e:
-            yield False, str(e) + " (either that's my fault or you messed up very badly)"
+def validationGame(path: str, cancel: threading.Event):
+    n = random.randint(MinPlayerCount, MaxPlayerCount)
+    k = random.randint(MinK, MaxK)
+    w = random.randint(MinW, MaxW)
+    j = random.randrange(0, n)
+
+    paths = [(path if i == j else testCode) for i in range(n)]
+
+    outcome, program, value = None, None, None
+    for cs in game(paths, k, w, cancel):
+        _, outcome, program, value = cs
+    return outcome, value
+
+
+def testProgram(path: str):
+    cancel = threading.Event()
+    with ThreadPoolExecutor(ValidationWidth) as pool:
+        futures = [pool.submit(validationGame, path, cancel) for _ in range(ValidationGames)]
+        try:
+            # progress is reported in the order the games finish, the first failure stops all others
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    outcome, value = future.result()
+                except Exception as e:
+                    yield False, str(e) + " (either that's my fault or you messed up very badly)"
+                    return
+
+                if outcome in (-1, TimeoutEnding):
+                    yield False, value
+                    return
+                yield True, done * 100 // ValidationGames
+        finally:
+            cancel.set()
+            for future in futures:
+                future.cancel()
+
+
+def fileDigest(path: str) -> str:
+    digest = sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(65536):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimit:
+    # ASGI middleware: an oversized upload is refused while its body is still arriving,
+    # before Starlette's form parser has spooled all of it to disk
+    paths = {"/upload.py", "/upload.cpp", "/upload.exe"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or MaxUploadSize is None or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
             return
+        limit = MaxUploadSize + UploadFormOverhead
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await self.refuse(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limitedReceive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # the parser sees a disconnect and stops reading, its error response is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limitedSend(message):
+            if not exceeded:
+                await send(message)
+
+        await self.app(scope, limitedReceive, limitedSend)
+        if exceeded:
+            await self.refuse(scope, receive, send)
+
+    @staticmethod
+    async def refuse(scope, receive, send):
+        response = uploadFailed(f"<h1>File too large</h1> Uploads may be at most {MaxUploadSize} bytes.")
+        response.status_code = 413
+        await response(scope, receive, send)
+
+
+def saveUpload(file: UploadFile, path: str, executable: bool = False) -> str:
+    # the upload is copied chunk by chunk, so its size in memory never exceeds UploadChunkSize
+    digest = sha256()
+    size = 0
+    try:
+        if MaxUploadSize is not None and file.size is not None and file.size > MaxUploadSize:
+            raise UploadTooLarge(f"The file is larger than {MaxUploadSize} bytes")
+        with open(path, "wb") as f:
+            while chunk := file.file.read(UploadChunkSize):
+                size += len(chunk)
+                if MaxUploadSize is not None and size > MaxUploadSize:
+                    raise UploadTooLarge(f"The file is larger than {MaxUploadSize} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        if executable:
+            os.chmod(path, 0o755)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        file.file.close()
+    return digest.hexdigest()
 
 
-def allPrograms():
-    pys = [pyPath + f for f in os.listdir(pyPath) if os.path.isfile(os.path.join(pyPath, f)) and f.endswith(".py") and not f.endswith(".temp.py")]
-    exes = [exePath + f for f in os.listdir(exePath) if os.path.isfile(os.path.join(exePath, f)) and not f.endswith(".temp")]
-    return pys + exes
+def unchangedSubmission(team: str, language: str, digest: str) -> bool:
+    known = submissionRegistry.get(team)
+    return known is not None and known.language == language and known.digest == digest and os.path.exists(known.path)
 
 
-app = FastAPI()
+def submissionFiles(team: str) -> list[str]:
+    return [exePath + team, cppPath + team + ".cpp", pyPath + team + ".py"]
+
+
+class Submission:
+    def __init__(self, team: str, language: str, path: str, digest: str, uploaded: float):
+        self.team = team
+        self.language = language
+        self.path = path
+        self.digest = digest
+        self.uploaded = uploaded
+
+    def info(self):
+        return {"team": self.team, "language": self.language, "hash": self.digest, "uploaded": self.uploaded}
+
+
+class SubmissionRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submissions = {}
+        # match-ups are generated from this tuple, it is replaced as a whole whenever a submission changes
+        self.snapshot = ()
+        self.watcher = None
+        self.scan()
+
+    def programs(self) -> list[str]:
+        return list(self.snapshot)
+
+    def get(self, team: str):
+        return self.submissions.get(team)
+
+    def all(self) -> list[Submission]:
+        return list(self.submissions.values())
+
+    def publish(self, team: str, language: str, temp: str, path: str, digest: str = None, source: str = None):
+        if digest is None:
+            digest = fileDigest(source if source is not None else temp)
+        with self.lock:
+            for p in submissionFiles(team):
+                if p != path and os.path.exists(p):
+                    os.remove(p)
+            # the source of a C++ submission stays next to its binary
+            if source is not None:
+                os.replace(source, cppPath + team + ".cpp")
+            os.replace(temp, path)
+            self.submissions[team] = Submission(team, language, path, digest, time.time())
+            self.rebuild()
+
+    def remove(self, team: str):
+        with self.lock:
+            for p in submissionFiles(team):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.submissions.pop(team, None)
+            self.rebuild()
+
+    def rebuild(self):
+        paths = [s.path for s in self.submissions.values()]
+        self.snapshot = tuple(sorted(p for p in paths if p.startswith(pyPath)) + sorted(p for p in paths if not p.startswith(pyPath)))
+
+    def scan(self):
+        found = {}
+        for f in os.listdir(pyPath):
+            if f.endswith(".py") and not f.endswith(".temp.py") and os.path.isfile(pyPath + f):
+                found[f.removesuffix(".py")] = ("python", pyPath + f)
+        for f in os.listdir(exePath):
+            if not f.endswith(".temp") and os.path.isfile(exePath + f):
+                found[f] = ("cpp" if os.path.exists(cppPath + f + ".cpp") else "executable", exePath + f)
+        with self.lock:
+            submissions = {}
+            for team, (language, path) in found.items():
+                known = self.submissions.get(team)
+                mtime = os.stat(path).st_mtime
+                if known is not None and known.path == path and known.uploaded >= mtime:
+                    submissions[team] = known
+                else:
+                    source = cppPath + team + ".cpp" if language == "cpp" else path
+                    submissions[team] = Submission(team, language, path, fileDigest(source), mtime)
+            self.submissions = submissions
+            self.rebuild()
+
+    def watch(self):
+        if inotify_simple is None or self.watcher is not None:
+            return
+        self.watcher = threading.Thread(target=self.follow, daemon=True)
+        self.watcher.start()
+
+    def follow(self):
+        flags = inotify_simple.flags
+        inotify = inotify_simple.INotify()
+        for directory in (pyPath, exePath, cppPath):
+            inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE)
+        while True:
+            events = inotify.read()
+            # the temporary files of running uploads are no reason to rescan
+            if any(not e.name.endswith((".temp", ".temp.py", ".temp.cpp")) for e in events):
+                try:
+                    self.scan()
+                except OSError:
+                    pass
+
+
+submissionRegistry = SubmissionRegistry()
+if WATCH_SUBMISSIONS:
+    submissionRegistry.watch()
+
+
+class StaticFile:
+    def __init__(self, path: str, mediaType: str, maxAge: int = 0):
+        self.path = path
+        self.mediaType = mediaType
+        self.maxAge = maxAge
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "rb") as f:
+            body = f.read()
+        self.body = body
+        self.encodings = {}
+        if len(body) > 512:
+            gz = zlib.compressobj(9, zlib.DEFLATED, 31)
+            self.encodings["gzip"] = gz.compress(body) + gz.flush()
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(body)
+        self.etag = '"' + sha256(body).hexdigest()[:32] + '"'
+        self.lastModified = formatdate(mtime, usegmt=True)
+        self.mtime = mtime
+
+    def current(self):
+        with self.lock:
+            if self.mtime is None or DEV_MODE and os.stat(self.path).st_mtime != self.mtime:
+                self.load()
+        return self
+
+    def text(self) -> str:
+        return self.current().body.decode()
+
+    def notModified(self, request: Request) -> bool:
+        match = request.headers.get("if-none-match")
+        if match is not None:
+            return match.strip() == "*" or self.etag in [tag.strip().removeprefix("W/") for tag in match.split(",")]
+        since = request.headers.get("if-modified-since")
+        if since is not None:
+            try:
+                return parsedate_to_datetime(since).timestamp() >= int(self.mtime)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, request: Request) -> Response:
+        self.current()
+        headers = {
+            "ETag": self.etag,
+            "Last-Modified": self.lastModified,
+            "Cache-Control": f"public, max-age={self.maxAge}" if self.maxAge else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self.notModified(request):
+            return Response(status_code=304, headers=headers)
+        accepted = [e.split(";")[0].strip() for e in request.headers.get("accept-encoding", "").split(",")]
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                return Response(self.encodings[encoding], media_type=self.mediaType, headers=headers)
+        return Response(self.body, media_type=self.mediaType, headers=headers)
+
+
+staticFiles = {
+    "index": StaticFile("html/index.html", "text/html"),
+    "preset": StaticFile("html/preset.html", "text/html"),
+    "random-game": StaticFile("html/random-game.html", "text/html"),
+    "log": StaticFile("html/log.html", "text/html"),
+    "tournament": StaticFile("html/tournament.html", "text/html"),
+    "admin": StaticFile("html/admin.html", "text/html"),
+    # the stylesheet is linked without a version, so like the pages it is revalidated (a 304 while unchanged)
+    "matcha": StaticFile("assets/matcha.css", "text/css"),
+    "favicon": StaticFile("assets/favicon.ico", "image/x-icon", 86400),
+    "background": StaticFile("assets/background.jpeg", "image/jpeg", 86400),
+}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    resumeCheckpointedTournament()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(UploadSizeLimit)
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    with open("html/index.html") as f:
-        return f.read()
+async def root(request: Request):
+    return staticFiles["index"].response(request)
+
+
+class UploadJob:
+    def __init__(self, team: str):
+        self.id = secrets.token_hex(8)
+        self.team = team
+        self.state = "queued"
+        self.ok = None
+        self.created = time.time()
+        # everything the job printed so far, a reconnecting browser is sent it again from the start
+        self.events = []
+        self.temporary = []
+        self.lock = threading.Lock()
+        self.waiters = []
+
+    def temp(self, directory: str, suffix: str) -> str:
+        path = f"{directory}{self.team}.{self.id}{suffix}"
+        self.temporary.append(path)
+        return path
+
+    def emit(self, text: str):
+        with self.lock:
+            self.events.append(text)
+            waiters, self.waiters = self.waiters, []
+        self.wake(waiters)
+
+    def finish(self, ok: bool):
+        for path in self.temporary:
+            if os.path.exists(path):
+                os.remove(path)
+        with self.lock:
+            self.ok = ok
+            self.state = "done"
+            waiters, self.waiters = self.waiters, []
+        self.wake(waiters)
+
+    @staticmethod
+    def wake(waiters):
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda f: f.done() or f.set_result(None), future)
+
+    async def follow(self):
+        loop = asyncio.get_running_loop()
+        sent = 0
+        while True:
+            with self.lock:
+                events = self.events[sent:]
+                done = self.state == "done"
+                if not events and not done:
+                    future = loop.create_future()
+                    self.waiters.append((loop, future))
+            if events:
+                sent += len(events)
+                yield "".join(events)
+            elif done:
+                return
+            else:
+                await future
+
+    def status(self):
+        return {"id": self.id, "team": self.team, "state": self.state, "ok": self.ok, "created": self.created, "events": len(self.events)}
+
+
+class UploadPipeline:
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(UploadWorkers)
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, job: UploadJob, work):
+        with self.lock:
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.state == "done"]
+            for old in finished[:max(0, len(finished) - UploadJobHistory)]:
+                del self.jobs[old.id]
+        self.pool.submit(self.run, job, work)
+        return job
+
+    def run(self, job: UploadJob, work):
+        job.state = "running"
+        ok = False
+        try:
+            while True:
+                job.emit(next(work))
+        except StopIteration as stop:
+            ok = stop.value is True
+        except Exception as e:
+            job.emit(f"<p style='color:red'>Internal error while processing the upload:</p><code>{e}</code></body></html>")
+        finally:
+            job.finish(ok)
 
+    def get(self, ID: str):
+        return self.jobs.get(ID)
 
-# PYTHON
-@app.post("/upload.py", response_class=HTMLResponse)
-async def wrapperUploadPy(team: Annotated[str, Form()], pw: Annotated[str, Form()], file: UploadFile = File(...)):
-    return StreamingResponse(uploadPy(team, pw, file), media_type="html")
+
+uploadPipeline = UploadPipeline()
 
 
-def uploadPy(team: str, pw: str, file: UploadFile = File(...)):
-    with open("html/preset.html") as f:
-        yield f.read()
+def uploadFailed(message: str):
+    return HTMLResponse(staticFiles["preset"].text() + message + "<br><a href='/'><button>Return to start page</button></a></body></html>")
 
+
+async def startUpload(team: str, pw: str, file: UploadFile, title: str, temp, work, executable: bool = False):
     if team not in teams.keys() or teams[team] != pwHash(pw):
-        yield "<h1>Invalid credentials</h1> Either the team name or the password is wrong."
-        return
+        file.file.close()
+        return uploadFailed("<h1>Invalid credentials</h1> Either the team name or the password is wrong.")
 
-    yield "<h2>Submitting python file</h2>"
-    yield "<h4>Uploading ...</h4>"
+    job = UploadJob(team)
+    path = temp(job)
     try:
-        with open(pyPath + team + ".temp.py", "wb") as f:
-            f.write(file.file.read())
+        # only the copy to disk happens while the request is open, compiling and testing is left to the upload workers
+        digest = await asyncio.to_thread(saveUpload, file, path, executable)
     except Exception as e:
-        yield f"There was an error uploading the file:\n {e}"
-        yield "<br><a href='/'><button>Return to start page</button></a></body></html>"
-        return
-    finally:
-        file.file.close()
+        return uploadFailed(f"<h2>{title}</h2><p>There was an error uploading the file:</p><br><code>{e}</code>")
+
+    job.emit(staticFiles["preset"].text())
+    job.emit(f"<h2>{title}</h2>")
+    job.emit("<p>Upload successful</p>")
+    uploadPipeline.submit(job, work(job, path, digest))
+    return RedirectResponse(f"/upload/{job.id}", status_code=303)
 
-    yield "<p>Upload successful</p>"
 
-    for t in testUpload(pyPath + team + ".temp.py"):
+@app.get("/upload/{ID}", response_class=HTMLResponse)
+async def uploadProgress(ID: str):
+    job = uploadPipeline.get(ID)
+    if job is None:
+        return uploadFailed("<h1>Unknown upload</h1> This upload doesn't exist (anymore).")
+    return StreamingResponse(job.follow(), media_type="text/html")
+
+
+@app.get("/upload/{ID}/status", response_class=JSONResponse)
+async def uploadStatus(ID: str):
+    job = uploadPipeline.get(ID)
+    if job is None:
+        return JSONResponse({"error": "Unknown upload"}, status_code=404)
+    return job.status()
+
+
+# PYTHON
+@app.post("/upload.py", response_class=HTMLResponse)
+async def wrapperUploadPy(team: Annotated[str, Form()], pw: Annotated[str, Form()], file: UploadFile = File(...)):
+    return await startUpload(team, pw, file, "Submitting python file", lambda job: job.temp(pyPath, ".temp.py"), uploadPy)
+
+
+def uploadPy(job: UploadJob, path: str, digest: str):
+    team = job.team
+    if unchangedSubmission(team, "python", digest):
+        yield "<p>This file is already your current submission, there is nothing to test.</p>"
+        yield "<h3>Done!<h3>"
+        yield "<a href='/'><button>Return</button></a>"
+        yield "</body></html>"
+        return True
+
+    for t in testUpload(path):
         value, ok = t
         yield value
         if not ok:
-            return
+            return False
 
     yield "<h3>Saving file</h3>"
-    deleteTeamSubmissions(team)
-    os.replace(pyPath + team + ".temp.py", pyPath + team + ".py")
+    submissionRegistry.publish(team, "python", path, pyPath + team + ".py", digest)
     yield "<p>Saving successful<p>"
 
     yield "<h3>Done!<h3>"
@@ -269,57 +1644,94 @@ def uploadPy(team: str, pw: str, file: UploadFile = File(...)):
     yield "<a href='/'><button>Return</button></a>"
 
     yield "</body></html>"
-    return
+    return True
+
+
+class CompileError(Exception):
+    def __init__(self, message, stderr=""):
+        Exception.__init__(self, message)
+        self.stderr = stderr
+
+
+class CompileService:
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(CompileWorkers)
+        self.lock = threading.Lock()
+        self.inFlight = {}
+
+    def compile(self, source: str, digest: str = None) -> Future:
+        if digest is None:
+            digest = fileDigest(source)
+        key = sha256((digest + "\0" + " ".join(compileCommand)).encode()).hexdigest()
+        binary = compileCachePath + key
+        with self.lock:
+            # an identical source that is compiling right now is joined instead of compiled twice
+            if key in self.inFlight:
+                return self.inFlight[key]
+            future = Future()
+            if os.path.exists(binary):
+                future.set_result(binary)
+                return future
+            future = self.pool.submit(self.build, source, binary)
+            self.inFlight[key] = future
+        future.add_done_callback(lambda _: self.finished(key))
+        return future
+
+    def finished(self, key):
+        with self.lock:
+            self.inFlight.pop(key, None)
+
+    def build(self, source: str, binary: str) -> str:
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy(source, os.path.join(tmp, "program.cpp"))
+            try:
+                subp = subprocess.run(compileCommand + ["-o", os.path.join(tmp, "program"), os.path.join(tmp, "program.cpp")], capture_output=True, timeout=compileTimeout)
+            except Exception as e:
+                raise CompileError(str(e))
+            if subp.returncode != 0:
+                raise CompileError(f"The compiler exited with code {subp.returncode}", subp.stderr.decode(errors="replace"))
+            # the binary only appears in the cache once it is complete
+            os.replace(os.path.join(tmp, "program"), binary)
+        return binary
+
+
+compileService = CompileService()
 
 
 # C++
 @app.post("/upload.cpp", response_class=HTMLResponse)
 async def wrapperUploadCpp(team: Annotated[str, Form()], pw: Annotated[str, Form()], file: UploadFile = File(...)):
-    return StreamingResponse(uploadCpp(team, pw, file), media_type="html")
+    return await startUpload(team, pw, file, "Submitting C++ file", lambda job: job.temp(cppPath, ".temp.cpp"), uploadCpp)
 
 
-def uploadCpp(team: str, pw: str, file: UploadFile = File(...)):
-    with open("html/preset.html") as f:
-        yield f.read()
+def uploadCpp(job: UploadJob, source: str, digest: str):
+    team = job.team
+    if unchangedSubmission(team, "cpp", digest):
+        yield "<p>This file is already your current submission, there is nothing to test.</p>"
+        yield "<h3>Done!<h3>"
+        yield "<a href='/'><button>Return</button></a>"
+        yield "</body></html>"
+        return True
 
-    if team not in teams.keys() or teams[team] != pwHash(pw):
-        yield "<h1>Invalid credentials</h1> Either the team name or the password is wrong."
-        return
-
-    yield "<h2>Submitting C++ file</h2>"
-    yield "<h4>Uploading ...</h4>"
-    try:
-        with open(cppPath + team + ".cpp", "wb") as f:
-            f.write(file.file.read())
-    except Exception as e:
-        yield f"<p>There was an error uploading the file:</p><br><code>{e}</code>"
-        yield "<br><a href='/'><button>Return to start page</button></a></body></html>"
-        return
-    finally:
-        file.file.close()
-
-    yield "<p>Upload successful</p>"
     yield "<h4>Compiling</h4>"
-    yield "<p>Compilation successful</p>"
-    es = ""
+    binary = job.temp(exePath, ".temp")
     try:
-        subp = subprocess.run(f"g++ -std=c++20 -o \"{exePath}{team}.temp\" \"{cppPath}{team}.cpp\"", shell=True, capture_output=True, timeout=compileTimeout)
-        es = subp.stderr.decode()
-        subp.check_returncode()
+        shutil.copy(compileService.compile(source, digest).result(), binary)
     except Exception as e:
+        es = e.stderr if isinstance(e, CompileError) else ""
         yield f"<p>There was an error compiling the your code:</p><code style='color: red'>{e}</code><br><br><p>stderr:</p><code style='color: red'>{es}</code>"
         yield "<br><a href='/'><button>Return to start page</button></a></body></html>"
-        return
+        return False
+    yield "<p>Compilation successful</p>"
 
-    for t in testUpload(exePath + team + ".temp"):
+    for t in testUpload(binary):
         value, ok = t
         yield value
         if not ok:
-            return
+            return False
 
     yield "<h3>Saving file</h3>"
-    deleteTeamSubmissions(team)
-    os.replace(exePath + team + ".temp", exePath + team)
+    submissionRegistry.publish(team, "cpp", binary, exePath + team, digest, source)
     yield "<p>Saving successful<p>"
 
     yield "<h3>Done!<h3>"
@@ -327,48 +1739,33 @@ def uploadCpp(team: str, pw: str, file: UploadFile = File(...)):
     yield "<a href='/'><button>Return</button></a>"
 
     yield "</body></html>"
-    return
+    return True
 
 # EXECUTABLE
 
 
 @app.post("/upload.exe", response_class=HTMLResponse)
 async def wrapperUploadExe(team: Annotated[str, Form()], pw: Annotated[str, Form()], file: UploadFile = File(...)):
-    return StreamingResponse(uploadExe(team, pw, file), media_type="html")
-
+    return await startUpload(team, pw, file, "Submitting executable", lambda job: job.temp(exePath, ".temp"), uploadExe, executable=True)
 
-def uploadExe(team: str, pw : str, file: UploadFile = File(...)):
-    with open("html/preset.html") as f:
-        yield f.read()
-
-    if team not in teams.keys() or teams[team] != pwHash(pw):
-        yield "<h1>Invalid credentials</h1> Either the team name or the password is wrong."
-        return
-
-    yield "<h2>Submitting executable</h2>"
-    yield "<h4>Uploading ...</h4>"
-    try:
-        with open(exePath + team + ".temp", "wb") as f:
-            f.write(file.file.read())
-        subprocess.run(f"chmod +x {exePath}{team}.temp", shell=True, capture_output=True, timeout=compileTimeout, check=True)
-    except Exception as e:
-        yield f"<p>There was an error uploading the file:</p><br><code>{e}</code>"
-        yield "<br><a href='/'><button>Return to start page</button></a></body></html>"
-        return
-    finally:
-        file.file.close()
 
-    yield "<p>Upload successful</p>"
+def uploadExe(job: UploadJob, path: str, digest: str):
+    team = job.team
+    if unchangedSubmission(team, "executable", digest):
+        yield "<p>This file is already your current submission, there is nothing to test.</p>"
+        yield "<h3>Done!<h3>"
+        yield "<a href='/'><button>Return</button></a>"
+        yield "</body></html>"
+        return True
 
-    for t in testUpload(exePath + team + ".temp"):
+    for t in testUpload(path):
         value, ok = t
         yield value
         if not ok:
-            return
+            return False
 
     yield "<h3>Saving file</h3>"
-    deleteTeamSubmissions(team)
-    os.replace(exePath + team + ".temp", exePath + team)
+    submissionRegistry.publish(team, "executable", path, exePath + team, digest)
     yield "<p>Saving successful<p>"
 
     yield "<h3>Done!<h3>"
@@ -376,7 +1773,7 @@ def uploadExe(team: str, pw : str, file: UploadFile = File(...)):
     yield "<a href='/'><button>Return</button></a>"
 
     yield "</body></html>"
-    return
+    return True
 
 
 def testUpload(path):
@@ -398,86 +1795,752 @@ def testUpload(path):
 
 
 @app.get("/randomGameDisplay", response_class=HTMLResponse)
-async def randomGameDisplay():
-    with open("html/random-game.html") as f:
-        return f.read()
+async def randomGameDisplay(request: Request):
+    return staticFiles["random-game"].response(request)
 
 
 @app.get("/randomGameLog", response_class=HTMLResponse)
-async def randomGameLog():
-    with open("html/log.html") as f:
-        return f.read()
+async def randomGameLog(request: Request):
+    return staticFiles["log"].response(request)
 
 
 @app.get("/background.jpeg")
-async def background():
-    def iterfile():
-        with open("assets/background.jpeg", mode="rb") as file_like:
-            yield from file_like
+async def background(request: Request):
+    return staticFiles["background"].response(request)
+
 
-    return StreamingResponse(iterfile(), media_type="jpeg")
+@app.get("/matcha.css")
+async def matcha(request: Request):
+    return staticFiles["matcha"].response(request)
 
 
-def getAllMatchUps():
-    for n in range(MinPlayerCount, MaxPlayerCount+1):
+def tournamentConfigurations(programs):
+    for n in range(MinPlayerCount, min(MaxPlayerCount, len(programs))+1):
         for k in range(MinK, MinK+1):
             for w in range(MinW, MaxW+1):
-                for mu in getAllMatchUpsWithFixedSize(allPrograms(), n):
-                    yield n, k, w, mu
+                yield n, k, w
+
+
+def sweepConfigurations(rng=random):
+    # Latin hypercube: every range is cut into SweepConfigurations strata and each stratum is used exactly once
+    columns = []
+    for low, high in [(MinPlayerCount, MaxPlayerCount), (MinK, MaxK), (MinW, MaxW)]:
+        strata = list(range(SweepConfigurations))
+        rng.shuffle(strata)
+        columns.append([low + int((s + rng.random()) * (high - low + 1) / SweepConfigurations) for s in strata])
+    return list(zip(*columns))
+
+
+def tournamentSettings(programs, sweep=None):
+    # (n, k, w, games) of every configuration that is played
+    if sweep is not None:
+        return [(min(n, len(programs)), k, w, SweepGameBudget // len(sweep)) for n, k, w in sweep]
+    return [(n, k, w, countMatchUpsWithFixedSize(len(programs), n)) for n, k, w in tournamentConfigurations(programs)]
+
+
+def getAllMatchUps(programs, rng=random, sweep=None):
+    if sweep is not None:
+        stream = []
+        for n, k, w, games in tournamentSettings(programs, sweep):
+            for _ in range(games):
+                yield n, k, w, drawGroup(programs, n, stream, rng)
+        return
+    for n, k, w in tournamentConfigurations(programs):
+        for mu in getMatchUpsWithFixedSize(programs, n, rng):
+            yield n, k, w, mu
 
 
 def getRandomMatchUp():
-    n = random.randint(MinPlayerCount, min(MaxPlayerCount, len(allPrograms())))
+    programs = submissionRegistry.programs()
+    n = random.randint(MinPlayerCount, min(MaxPlayerCount, len(programs)))
     k = random.randint(MinK, MaxK)
     w = random.randint(MinW, MaxW)
-    mu = random.choice(list(getAllMatchUpsWithFixedSize(allPrograms(),n)))
+    # an ordered sample is uniform over all seatings, just like picking from every permutation
+    mu = random.sample(programs, n)
     return n, k, w, mu
 
 def getAllMatchUpsWithFixedSize(programs, n):
-    if n > len(programs):
-        return
-    if n == 0:
-        yield []
-        return
-    for program in programs:
-        for matchUp in getAllMatchUpsWithFixedSize(set(programs) - {program}, n - 1):
-            yield matchUp + [program]
+    for mu in itertools.permutations(programs, n):
+        yield list(mu)
+
+
+def seatRotations(n):
+    rotations = n if SeatRotations is None else max(1, min(SeatRotations, n))
+    return [i * n // rotations for i in range(rotations)]
+
+
+def getMatchUpsWithFixedSize(programs, n, rng=random):
+    if TournamentDesign == "permutations":
+        yield from getAllMatchUpsWithFixedSize(programs, n)
+    elif TournamentDesign == "combinations":
+        rotations = seatRotations(n)
+        for group in itertools.combinations(programs, n):
+            for r in rotations:
+                yield list(group[r:] + group[:r])
+    elif TournamentDesign in ("sampled", "adaptive", "racing"):
+        yield from getSampledMatchUps(programs, n, rng)
+    else:
+        raise ValueError(f"Unknown tournament design {TournamentDesign}")
+
+
+def countMatchUpsWithFixedSize(p, n):
+    if n > p:
+        return 0
+    if TournamentDesign == "permutations":
+        return math.perm(p, n)
+    if TournamentDesign == "combinations":
+        return math.comb(p, n) * len(seatRotations(n))
+    return math.ceil(p * SampledGamesPerProgram / n)
+
+
+def countMatchUps(programs):
+    if TournamentDesign == "racing" and RacingGameBudget is not None:
+        return RacingGameBudget
+    if TournamentSweep:
+        return SweepGameBudget // SweepConfigurations * SweepConfigurations
+    return sum(countMatchUpsWithFixedSize(len(programs), n) for n, k, w in tournamentConfigurations(programs))
+
+
+def getSampledMatchUps(programs, n, rng=random):
+    # groups are cut from a stream of shuffled copies of the program list (a resolvable design),
+    # so every program plays (almost) equally often and in random seats
+    stream = []
+    for _ in range(countMatchUpsWithFixedSize(len(programs), n)):
+        yield drawGroup(programs, n, stream, rng)
+
+
+def drawGroup(programs, n, stream, rng=random):
+    group = []
+    skipped = []
+    while len(group) < n:
+        if not stream:
+            stream += programs
+            rng.shuffle(stream)
+        program = stream.pop()
+        (skipped if program in group else group).append(program)
+    stream += skipped
+    return group
+
+
+def pendingSigma(sigma, pending):
+    # every game that is queued or running but not rated yet is counted as if it had already narrowed the rating
+    # (the information of one game is about 1 / RatingBeta^2), so the next groups move on to other programs
+    return math.sqrt(1 / (1 / (sigma * sigma) + pending / (RatingBeta * RatingBeta)))
+
+
+def informativeGroup(programs, n, ratings, pending={}, rng=random):
+    rated = []
+    for p in programs:
+        mu, sigma = ratings.get(p, (RatingMu, RatingSigma))
+        rated.append((p, mu, pendingSigma(sigma, pending.get(p, 0))))
+    # the least known program plays against the programs closest to it, preferring other uncertain ones
+    anchor = max(rated, key=lambda r: (r[2], rng.random()))
+    rated.sort(key=lambda r: (r is not anchor, abs(r[1] - anchor[1]) - r[2], rng.random()))
+    group = [r[0] for r in rated[:n]]
+    rng.shuffle(group)
+    return group
+
+
+def getAdaptiveMatchUps(programs, rng, games, sweep=None):
+    settings = tournamentSettings(programs, sweep)
+    weights = [s[3] for s in settings]
+    # the feeder runs up to TournamentQueueSize + workers games ahead of the ratings, these games are still pending
+    tournamentResults.flush()
+    dispatched = dict(tournamentResults.snapshot()[4])
+    for _ in range(games):
+        n, k, w, _ = rng.choices(settings, weights)[0]
+        snapshot = tournamentResults.snapshot()
+        ratings, rated = snapshot[2], snapshot[4]
+        pending = {p: max(0, dispatched.get(p, 0) - rated.get(p, 0)) for p in programs}
+        group = informativeGroup(programs, n, ratings, pending, rng)
+        for p in group:
+            dispatched[p] = dispatched.get(p, 0) + 1
+        yield n, k, w, group
+
+
+def settledPrograms(active, ratings, z):
+    # a program is settled once the difference to every other rating is significant
+    settled = []
+    for p in active:
+        mu, sigma = ratings[p]
+        if all(abs(mu - m) > z * math.sqrt(sigma * sigma + s * s) for q, (m, s) in ratings.items() if q != p):
+            settled.append(p)
+    return settled
+
+
+def waitForResults(played):
+    while tournamentResults.snapshot()[1] < played:
+        if tournamentScheduler is not None and tournamentScheduler.cancelled.is_set():
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def getRacingMatchUps(programs, rng, games, played=0, sweep=None):
+    global racingSettled
+    z = NormalDist().inv_cdf((1 + RacingConfidence) / 2)
+    active = list(programs)
+    stream = []
+    # the reset of the results is applied by the aggregator thread, so the first round must not read the old state
+    tournamentResults.flush()
+    while games > 0:
+        # a round is only judged once all of its games are rated
+        if not waitForResults(played):
+            return
+        scores, played, ratings = tournamentResults.snapshot()[:3]
+        settled = settledPrograms(active, ratings, z)
+        if settled:
+            racingSettled = racingSettled | {p: played for p in settled}
+            active = [p for p in active if p not in racingSettled]
+            stream = [p for p in stream if p not in racingSettled]
+        if len(active) < MinPlayerCount:
+            return
+
+        settings = tournamentSettings(active, sweep)
+        weights = [s[3] for s in settings]
+        meanSize = sum(s[0] * s[3] for s in settings) / sum(weights)
+        roundGames = min(games, math.ceil(len(active) * RacingGamesPerRound / meanSize))
+        for _ in range(roundGames):
+            n, k, w, _ = rng.choices(settings, weights)[0]
+            yield n, k, w, drawGroup(active, n, stream, rng)
+        games -= roundGames
+        played += roundGames
+
+
+def shuffled(items, rng=random, bufferSize=None):
+    buffer = []
+    for item in items:
+        buffer.append(item)
+        if len(buffer) >= (bufferSize or ShuffleBufferSize):
+            i = rng.randrange(len(buffer))
+            buffer[i], buffer[-1] = buffer[-1], buffer[i]
+            yield buffer.pop()
+    rng.shuffle(buffer)
+    yield from buffer
 
 
 @app.get("/randomGame", response_class=JSONResponse)
-def randomGame():
+async def randomGame():
     n, k, w, mu = getRandomMatchUp()
 
     names = [os.path.basename(f).removesuffix(".py") for f in mu]
 
     scoreList = []
     submissionList = []
-    for gs in game(mu, k, w):
-        if gs[0]:
-            _, ending, winner, value = gs
-            return {"n": n, "k": k, "w": w, "names": names, "score-list": scoreList, "submission-list": submissionList, "ending": ending, "winner": winner, "value": value}
-        else:
-            scoreList.append(gs[1].copy())
-            submissionList.append(gs[2].copy())
+    recorder = MoveRecorder(k)
+    async with aclosing(asyncGame(mu, k, w)) as states:
+        async for gs in states:
+            if gs[0]:
+                _, ending, winner, value = gs
+                ID = replayStore.save(mu, k, w, recorder, ending, winner, value) if replayStore is not None else None
+                return {"id": ID, "n": n, "k": k, "w": w, "names": names, "score-list": scoreList, "submission-list": submissionList, "ending": ending, "winner": winner, "value": value}
+            else:
+                scoreList.append(gs[1].copy())
+                submissionList.append(gs[2].copy())
+                recorder.add(gs[2])
     return {"n": n, "k": k, "w": w, "names": names, "score-list": scoreList, "submission-list": submissionList, "ending": -1, "winner": -1, "value": "unknown error"}
 
 
+async def streamRandomGame():
+    n, k, w, mu = getRandomMatchUp()
+    yield json.dumps({"n": n, "k": k, "w": w, "names": [os.path.basename(f).removesuffix(".py") for f in mu]}) + "\n"
+
+    # every round is sent as soon as it is played, only the packed moves are kept for the replay
+    recorder = MoveRecorder(k)
+    async with aclosing(asyncGame(mu, k, w)) as states:
+        async for gs in states:
+            if gs[0]:
+                _, ending, winner, value = gs
+                ID = replayStore.save(mu, k, w, recorder, ending, winner, value) if replayStore is not None else None
+                yield json.dumps({"id": ID, "ending": ending, "winner": winner, "value": value}) + "\n"
+                return
+            yield json.dumps({"scores": gs[1], "submissions": gs[2]}) + "\n"
+            recorder.add(gs[2])
+    yield json.dumps({"id": None, "ending": -1, "winner": -1, "value": "unknown error"}) + "\n"
+
+
+@app.get("/randomGame/stream")
+async def randomGameStream():
+    return StreamingResponse(streamRandomGame(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@app.get("/game/{ID}", response_class=JSONResponse)
+async def replayGame(ID: int):
+    if replayStore is None:
+        return JSONResponse({"error": "Replays are disabled"}, status_code=404)
+    loaded = await asyncio.to_thread(replayStore.load, ID)
+    if loaded is None:
+        return JSONResponse({"error": "Unknown game"}, status_code=404)
+    names, (n, k, w, rounds, bits, moves, ending, winner, value) = loaded
+
+    # the history is only decoded now, from the packed moves
+    scores = [0 for _ in range(n)]
+    scoreList = []
+    submissionList = []
+    for submissions in decodeMoves(moves, n, rounds, bits):
+        scoreRound(scores, submissions)
+        scoreList.append(scores.copy())
+        submissionList.append(submissions)
+    return {"id": ID, "n": n, "k": k, "w": w, "names": names, "score-list": scoreList, "submission-list": submissionList, "ending": ending, "winner": winner, "value": value}
+
+
+@app.get("/games", response_class=JSONResponse)
+async def searchGames(team: str = None, n: int = None, k: int = None, w: int = None, limit: int = 100):
+    if replayStore is None:
+        return []
+    return await asyncio.to_thread(replayStore.search, team, n, k, w, max(1, min(limit, 1000)))
+
+
+def tournamentWorkerCount():
+    if TournamentWorkers is not None:
+        return TournamentWorkers
+    return max(1, min(os.cpu_count() or 1, ContainerPoolSize // MaxPlayerCount))
+
+
+def gameRanks(n, d, ID):
+    # 0 is the best rank, players of the same rank are tied
+    if d == 1:
+        return [0 if i == ID else 1 for i in range(n)]
+    if d == 0:
+        return [0] * n
+    # the player that caused an error or timeout lost against everyone else
+    return [1 if i == ID else 0 for i in range(n)]
+
+
+def rateGame(ratings, players, ranks):
+    # Weng & Lin (2011), Algorithm 4; the sums over better ranked players are prefix sums over the rank levels, so O(n)
+    rated = [ratings.get(p, (RatingMu, RatingSigma)) for p in players]
+    c = math.sqrt(sum(sigma * sigma + RatingBeta * RatingBeta for _, sigma in rated))
+    strengths = [math.exp(mu / c) for mu, _ in rated]
+
+    levels = sorted(set(ranks))
+    tied = dict.fromkeys(levels, 0)
+    worse = dict.fromkeys(levels, 0.0)
+    for rank, strength in zip(ranks, strengths):
+        tied[rank] += 1
+        worse[rank] += strength
+    inverse = {}
+    inverseSquared = {}
+    remaining = sum(strengths)
+    a = b = 0.0
+    for rank in levels:
+        a += 1 / remaining
+        b += 1 / (remaining * remaining)
+        inverse[rank] = a
+        inverseSquared[rank] = b
+        remaining -= worse[rank]
+
+    for p, (mu, sigma), strength, rank in zip(players, rated, strengths, ranks):
+        omega = 1 / tied[rank] - strength * inverse[rank]
+        delta = strength * inverse[rank] - strength * strength * inverseSquared[rank]
+        variance = sigma * sigma
+        mu += variance / c * omega
+        variance *= max(1 - sigma / c * variance / (c * c) * delta, RatingKappa)
+        ratings[p] = (mu, math.sqrt(variance))
+
+
+class ResultAggregator:
+    def __init__(self):
+        self.updates = queue.SimpleQueue()
+        # (scores, played, ratings, configurations, rated games per program) is replaced as a whole,
+        # so readers always get a consistent snapshot without locking
+        self.state = ({}, 0, {}, {}, {})
+        self.log = None
+        self.consumer = threading.Thread(target=self.consume, daemon=True)
+        self.consumer.start()
+
+    def reset(self, programs, log=None):
+        self.updates.put(("reset", (programs, log)))
+
+    def add(self, program, points, record=None, players=None, ranks=None, configuration=None):
+        self.updates.put(("add", (program, points, record, players, ranks, configuration)))
+
+    def finish(self, record):
+        self.updates.put(("finish", record))
+        self.flush()
+
+    def flush(self):
+        done = threading.Event()
+        self.updates.put(("flush", done))
+        done.wait()
+
+    def snapshot(self):
+        return self.state
+
+    def consume(self):
+        while True:
+            batch = [self.updates.get()]
+            # everything queued meanwhile is applied in one go, so heavy contention means fewer, bigger batches
+            try:
+                while True:
+                    batch.append(self.updates.get_nowait())
+            except queue.Empty:
+                pass
+
+            scores, played, ratings, configurations, rated = self.state
+            scores = dict(scores)
+            ratings = dict(ratings)
+            configurations = dict(configurations)
+            rated = dict(rated)
+            flushed = []
+            for kind, value in batch:
+                # a failing update is only logged, the consumer must keep going or every flush() would block forever
+                try:
+                    if kind == "reset":
+                        programs, log = value
+                        self.closeLog()
+                        self.log = log
+                        scores, played, ratings = {p: 0 for p in programs}, 0, {p: (RatingMu, RatingSigma) for p in programs}
+                        configurations = {}
+                        rated = {}
+                    elif kind == "add":
+                        program, points, record, players, ranks, configuration = value
+                        scores[program] = scores.get(program, 0) + points
+                        played += 1
+                        if players is not None:
+                            rateGame(ratings, players, ranks)
+                            for p in players:
+                                rated[p] = rated.get(p, 0) + 1
+                        if configuration is not None:
+                            # the results of a configuration are copied on write, so older snapshots stay untouched
+                            games, results = configurations.get(configuration, (0, {}))
+                            results = dict(results)
+                            results[program] = results.get(program, 0) + points
+                            configurations[configuration] = (games + 1, results)
+                        self.write(record)
+                    elif kind == "finish":
+                        self.write(value)
+                        self.closeLog()
+                    else:
+                        flushed.append(value)
+                except Exception as e:
+                    print(f"Tournament result update {kind} failed: {e!r}")
+            try:
+                if self.log is not None:
+                    self.log.flush()
+            except Exception as e:
+                print(f"Tournament checkpoint could not be written: {e!r}")
+            self.state = (scores, played, ratings, configurations, rated)
+            for done in flushed:
+                done.set()
+
+    def write(self, record):
+        if self.log is not None and record is not None:
+            self.log.write(json.dumps(record) + "\n")
+
+    def closeLog(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+tournamentResults = ResultAggregator()
+
+
+def recordTournamentResult(i, setting, d, ID, replay):
+    n, k, w, mu = setting
+    if replayStore is not None:
+        recorder, value = replay
+        replayStore.save(mu, k, w, recorder, d, ID, value)
+    # a timeout costs the same point as any other error
+    points = -1 if d == TimeoutEnding else d
+    ranks = gameRanks(n, d, ID)
+    record = {"i": i, "program": mu[ID], "points": points, "players": mu, "ranks": ranks, "configuration": [n, k, w]}
+    tournamentResults.add(mu[ID], points, record, mu, ranks, (n, k, w))
+
+
+def tournamentPlan():
+    # everything the order of the match-ups depends on, besides the programs and the seed
+    return {
+        "design": TournamentDesign,
+        "rotations": SeatRotations,
+        "samples": SampledGamesPerProgram,
+        "racing": [RacingGamesPerRound, RacingConfidence, RacingGameBudget],
+        "buffer": ShuffleBufferSize,
+        "n": [MinPlayerCount, MaxPlayerCount],
+        "k": [MinK, MaxK if TournamentSweep else MinK],
+        "w": [MinW, MaxW],
+        "sweep": [SweepConfigurations, SweepGameBudget] if TournamentSweep else None,
+    }
+
+
+def tournamentMatchUps(programs, seed, done=()):
+    global racingSettled
+    racingSettled = {}
+    rng = random.Random(seed)
+    sweep = sweepConfigurations(rng) if TournamentSweep else None
+    if TournamentDesign in ("adaptive", "racing"):
+        # the groups depend on the results so far, so they are picked while the feeder fills the task queue:
+        # adaptive groups count the games still in the queue, racing waits for the results of every round
+        indices = (i for i in itertools.count() if i not in done)
+        if TournamentDesign == "adaptive":
+            matchUps = getAdaptiveMatchUps(programs, rng, countMatchUps(programs) - len(done), sweep)
+        else:
+            matchUps = getRacingMatchUps(programs, rng, countMatchUps(programs) - len(done), len(done), sweep)
+        yield from zip(indices, matchUps)
+        return
+    for i, setting in enumerate(shuffled(getAllMatchUps(programs, rng, sweep), rng)):
+        if i not in done:
+            yield i, setting
+
+
+def readCheckpoint():
+    if TournamentCheckpointPath is None or not os.path.exists(TournamentCheckpointPath):
+        return None, [], False, ""
+    with open(TournamentCheckpointPath) as f:
+        text = f.read()
+    header = None
+    results = []
+    ended = False
+    for line in text.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # the last line may be cut off by a crash
+            continue
+        if header is None:
+            header = record
+        elif "i" in record:
+            results.append(record)
+        else:
+            ended = True
+    return header, results, ended, text
+
+
 class TournamentThread(threading.Thread):
-    def __init__(self, setting):
-        threading.Thread.__init__(self)
-        self.n, self.k, self.w, self.mu  = setting
+    def __init__(self, tasks, running, cancelled, report, sessions=None):
+        threading.Thread.__init__(self, daemon=True)
+        self.tasks = tasks
+        self.running = running
+        self.cancelled = cancelled
+        self.report = report
+        self.sessions = sessions
 
     def run(self):
-        global scores, playedGames
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            i, setting = task
+            self.running.wait()
+            if self.cancelled.is_set():
+                # keep draining the queue so the feeder is never blocked
+                continue
+
+            n, k, w, mu = setting
+            d = 0
+            ID = 0
+            value = ""
+            recorder = MoveRecorder(k)
+
+            try:
+                for cs in game(mu, k, w, self.cancelled, self.sessions):
+                    if cs[0]:
+                        _, d, ID, value = cs
+                    else:
+                        recorder.add(cs[2])
+
+                # a game stopped by the cancellation has no result
+                if self.cancelled.is_set() and value == "Cancelled":
+                    continue
+                self.report(i, setting, d, ID, (recorder, value))
+            except Exception as e:
+                # the worker keeps going, only this game is missing from the results
+                print(f"Tournament game {i} failed: {e!r}")
+
+
+async def asyncTournamentWorker(tasks, running, cancelled, report):
+    while True:
+        task = await tasks.get()
+        if task is None:
+            return
+        i, setting = task
+        if not running.is_set():
+            await asyncio.to_thread(running.wait)
+        if cancelled.is_set():
+            continue
+
+        n, k, w, mu = setting
         d = 0
         ID = 0
+        value = ""
+        recorder = MoveRecorder(k)
+
+        try:
+            async with aclosing(asyncGame(mu, k, w, cancelled)) as states:
+                async for cs in states:
+                    if cs[0]:
+                        _, d, ID, value = cs
+                    else:
+                        recorder.add(cs[2])
+
+            if cancelled.is_set() and value == "Cancelled":
+                continue
+            report(i, setting, d, ID, (recorder, value))
+        except Exception as e:
+            print(f"Tournament game {i} failed: {e!r}")
+
+
+def tournamentProcess(tasks, results, running, cancelled, threads):
+    report = lambda i, setting, d, ID, replay: results.put((i, setting, d, ID, replay))
+    sessions = SessionPool() if USE_SESSIONS else None
+    workers = [TournamentThread(tasks, running, cancelled, report, sessions) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if sessions is not None:
+        sessions.clear()
+    containerPool.shutdown()
+    results.put(os.getpid())
+
+
+class TournamentScheduler:
+    def __init__(self, matchUps, workers, processes=0, asynchronous=False):
+        self.threadCount = workers
+        self.processes = []
+        self.threads = []
+        self.collector = None
+        self.loop = None
+        self.sessions = None
+
+        if processes > 0:
+            ctx = multiprocessing.get_context("fork")
+            self.tasks = ctx.Queue(maxsize=TournamentQueueSize)
+            self.results = ctx.Queue()
+            self.running = ctx.Event()
+            self.cancelled = ctx.Event()
+            processes = min(processes, workers)
+            for i in range(processes):
+                threads = workers // processes + (1 if i < workers % processes else 0)
+                self.processes.append(ctx.Process(
+                    target=tournamentProcess,
+                    args=(self.tasks, self.results, self.running, self.cancelled, threads),
+                    daemon=True
+                ))
+            self.collector = threading.Thread(target=self.collect, daemon=True)
+        elif asynchronous:
+            self.loop = asyncio.new_event_loop()
+            self.tasks = None
+            self.running = threading.Event()
+            self.cancelled = threading.Event()
+            self.threads = [threading.Thread(target=self.runLoop, daemon=True)]
+        else:
+            self.tasks = queue.Queue(maxsize=TournamentQueueSize)
+            self.running = threading.Event()
+            self.cancelled = threading.Event()
+            self.sessions = SessionPool() if USE_SESSIONS else None
+            self.threads = [TournamentThread(self.tasks, self.running, self.cancelled, recordTournamentResult, self.sessions) for _ in range(workers)]
+
+        self.running.set()
+        self.feeder = threading.Thread(target=self.feed, args=(matchUps,), daemon=True)
+
+    def start(self):
+        for worker in self.threads + self.processes:
+            worker.start()
+        if self.collector is not None:
+            self.collector.start()
+        self.feeder.start()
+
+    def runLoop(self):
+        async def runWorkers():
+            self.tasks = asyncio.Queue(maxsize=TournamentQueueSize)
+            await asyncio.gather(*(
+                asyncTournamentWorker(self.tasks, self.running, self.cancelled, recordTournamentResult)
+                for _ in range(self.threadCount)
+            ))
+
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(runWorkers())
+        self.loop.close()
+
+    def put(self, task):
+        if self.processes:
+            # once every tournament process is gone nobody takes tasks any more, so they are dropped
+            while any(worker.exitcode is None for worker in self.processes):
+                try:
+                    self.tasks.put(task, timeout=TournamentPollInterval)
+                    return
+                except queue.Full:
+                    pass
+            return
+        if self.loop is None:
+            self.tasks.put(task)
+            return
+        while self.tasks is None:
+            time.sleep(0.01)
+        asyncio.run_coroutine_threadsafe(self.tasks.put(task), self.loop).result()
+
+    def collect(self):
+        # results of the tournament processes are applied in the web process, so /tournament stays live
+        remaining = {worker.pid: worker for worker in self.processes}
+        while remaining:
+            try:
+                result = self.results.get(timeout=TournamentPollInterval)
+            except queue.Empty:
+                # a process that was killed (e.g. by the OOM killer) never sends its end marker
+                for pid, worker in list(remaining.items()):
+                    # exit code 0 means the end marker was sent and is still on its way
+                    if worker.exitcode not in (None, 0):
+                        del remaining[pid]
+                        print(f"Tournament process {pid} died with exit code {worker.exitcode}, the games it was playing are lost")
+                continue
+            if isinstance(result, int):
+                remaining.pop(result, None)
+            else:
+                recordTournamentResult(*result)
 
-        for cs in game(self.mu, self.k, self.w):
-            _, d, ID, _ = cs
+    def feed(self, matchUps):
+        global muCount
+        try:
+            # the bounded queue blocks the feeder until a worker is free (back-pressure)
+            for task in matchUps:
+                if self.cancelled.is_set():
+                    break
+                self.running.wait()
+                self.put(task)
+        except Exception as e:
+            # the tournament ends as cancelled, so it is not resumed from the checkpoint again
+            print(f"The tournament was stopped, because its games could not be generated: {e!r}")
+            self.cancel()
+        finally:
+            for _ in range(self.threadCount):
+                self.put(None)
+            for worker in self.threads:
+                worker.join()
+            if self.sessions is not None:
+                self.sessions.clear()
+            if self.collector is not None:
+                self.collector.join()
+            for worker in self.processes:
+                worker.join()
+            tournamentResults.flush()
+            # a cancelled or early stopped (racing) tournament ends with fewer games than planned
+            muCount = tournamentResults.snapshot()[1]
+            if self.cancelled.is_set():
+                tournamentResults.finish({"cancelled": True})
+            else:
+                tournamentResults.finish({"finished": True})
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.running.set()
 
-        scores[self.mu[ID]] += d
+    def isAlive(self):
+        return self.feeder.is_alive()
 
-        playedGames += 1
+    def state(self):
+        if not self.isAlive():
+            return "cancelled" if self.cancelled.is_set() else "finished"
+        if self.cancelled.is_set():
+            return "cancelling"
+        return "running" if self.running.is_set() else "paused"
 
 
 class pwWrapper(BaseModel):
@@ -488,46 +2551,212 @@ class pwWrapper(BaseModel):
 async def startTournament(wrapper: pwWrapper):
     if wrapper.pw != adminPW:
         return {"ok": False, "error": "Invalid password"}
-    global scores, playedGames, muCount
-    if muCount > playedGames:
+    global muCount
+    if tournamentScheduler is not None and tournamentScheduler.isAlive():
         return {"ok": False, "error": "Tournament is still running"}
-    programs = allPrograms()
-    scores = {p: 0 for p in programs}
+    if TournamentDesign not in TournamentDesigns:
+        return {"ok": False, "error": f"Unknown tournament design {TournamentDesign}"}
+    programs = submissionRegistry.programs()
     if len(programs) <= 1:
         return {"ok": False, "error": "Too few players"}
-    mus = list(getAllMatchUps())
-    print(mus)
-    shuffle(mus)
-    muCount = len(mus)
-    playedGames = 0
-    starterThread = threading.Thread()
-    starterThread.run = lambda: [TournamentThread(mu).start() for mu in mus]
-    starterThread.start()
+    seed = random.randrange(2**32)
+    muCount = countMatchUps(programs)
+    log = None
+    if TournamentCheckpointPath is not None:
+        log = open(TournamentCheckpointPath, "w")
+        log.write(json.dumps({"seed": seed, "programs": programs, "games": muCount, "plan": tournamentPlan()}) + "\n")
+    tournamentResults.reset(programs, log)
+    startScheduler(tournamentMatchUps(programs, seed))
     return {"ok": True}
 
 
-@app.get("/tournament", response_class=JSONResponse)
-async def tournament():
+def startScheduler(mus):
+    global tournamentScheduler
+    if TournamentAsync and TournamentProcesses <= 0:
+        tournamentScheduler = TournamentScheduler(mus, TournamentAsyncWorkers, asynchronous=True)
+    else:
+        tournamentScheduler = TournamentScheduler(mus, tournamentWorkerCount(), TournamentProcesses)
+    tournamentScheduler.start()
+
+
+def resumeCheckpointedTournament():
+    global muCount
+    header, results, ended, text = readCheckpoint()
+    if header is None or ended:
+        return
+    if header["plan"] != tournamentPlan():
+        print("The unfinished tournament in the checkpoint was not resumed, because the tournament settings changed")
+        return
+
+    log = open(TournamentCheckpointPath, "a")
+    if not text.endswith("\n"):
+        log.write("\n")
+    muCount = header["games"]
+    tournamentResults.reset(header["programs"], log)
+    for record in results:
+        configuration = tuple(record["configuration"]) if "configuration" in record else None
+        tournamentResults.add(record["program"], record["points"], None, record.get("players"), record.get("ranks"), configuration)
+    done = {record["i"] for record in results}
+    startScheduler(tournamentMatchUps(header["programs"], header["seed"], done))
+    print(f"Resumed the tournament after {len(done)} of {muCount} games")
+
+
+def controlTournament(wrapper, action):
+    if wrapper.pw != adminPW:
+        return {"ok": False, "error": "Invalid password"}
+    if tournamentScheduler is None or not tournamentScheduler.isAlive():
+        return {"ok": False, "error": "No tournament running"}
+    action(tournamentScheduler)
+    return {"ok": True, "state": tournamentScheduler.state()}
+
+
+@app.post("/pause-tournament", response_class=JSONResponse)
+async def pauseTournament(wrapper: pwWrapper):
+    return controlTournament(wrapper, TournamentScheduler.pause)
+
+
+@app.post("/resume-tournament", response_class=JSONResponse)
+async def resumeTournament(wrapper: pwWrapper):
+    return controlTournament(wrapper, TournamentScheduler.resume)
+
+
+@app.post("/cancel-tournament", response_class=JSONResponse)
+async def cancelTournament(wrapper: pwWrapper):
+    return controlTournament(wrapper, TournamentScheduler.cancel)
+
+
+@lru_cache(maxsize=None)
+def displayName(program):
+    return os.path.basename(program).removesuffix(".py")
+
+
+def tournamentStatus():
+    scores, played, ratings = tournamentResults.snapshot()[:3]
+    return scores, played, muCount, tournamentScheduler.state() if tournamentScheduler is not None else "idle", ratings, racingSettled
+
+
+def ratingView(rating):
+    mu, sigma = rating
+    return {"mu": round(mu, 3), "sigma": round(sigma, 3), "low": round(mu - RatingInterval * sigma, 3), "high": round(mu + RatingInterval * sigma, 3)}
+
+
+def tournamentView(status):
+    scores, played, games, state, ratings, settled = status
     return {
-        "scores": {os.path.basename(f).removesuffix(".py"): s for f, s in scores.items()},
-        "played": playedGames,
-        "games": muCount,
+        "scores": {displayName(f): s for f, s in scores.items()},
+        "played": played,
+        "games": games,
+        "state": state,
+        "ratings": {displayName(f): ratingView(r) for f, r in ratings.items()},
+        "settled": {displayName(f): g for f, g in settled.items()},
     }
 
 
+@app.get("/tournament", response_class=JSONResponse)
+async def tournament():
+    return tournamentView(tournamentStatus())
+
+
+class TournamentStream:
+    def __init__(self):
+        # one sampler diffs the standings for all viewers, every viewer only gets the latest delta or a full snapshot
+        self.seq = 0
+        self.status = None
+        self.delta = None
+        self.snapshot = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.sampler = None
+
+    def update(self):
+        status = tournamentStatus()
+        previous = self.status
+        if previous is None or previous[0].keys() != status[0].keys():
+            # first sample or a new tournament: viewers have to start over
+            delta = None
+        else:
+            delta = {"scores": {displayName(f): s for f, s in status[0].items() if previous[0][f] != s}}
+            if status[1] != previous[1]:
+                delta["played"] = status[1] - previous[1]
+            if status[2] != previous[2]:
+                delta["games"] = status[2]
+            if status[3] != previous[3]:
+                delta["state"] = status[3]
+            ratings = {displayName(f): ratingView(r) for f, r in status[4].items() if previous[4].get(f) != r}
+            if ratings:
+                delta["ratings"] = ratings
+            if status[5] is not previous[5]:
+                delta["settled"] = {displayName(f): g for f, g in status[5].items()}
+            if len(delta) == 1 and not delta["scores"]:
+                return False
+        self.status = status
+        self.delta = delta
+        self.snapshot = None
+        self.seq += 1
+        return True
+
+    def message(self, previousSeq):
+        if self.delta is not None and previousSeq == self.seq - 1:
+            return f"event: delta\ndata: {json.dumps(self.delta)}\n\n"
+        if self.snapshot is None:
+            self.snapshot = f"event: snapshot\ndata: {json.dumps(tournamentView(self.status))}\n\n"
+        return self.snapshot
+
+    async def sample(self):
+        while self.subscribers > 0:
+            if self.update():
+                async with self.changed:
+                    self.changed.notify_all()
+            await asyncio.sleep(TournamentStreamInterval)
+        self.sampler = None
+
+    async def subscribe(self, request: Request):
+        self.subscribers += 1
+        if self.sampler is None:
+            self.update()
+            self.sampler = asyncio.create_task(self.sample())
+        try:
+            seq = None
+            while not await request.is_disconnected():
+                if seq != self.seq:
+                    message = self.message(seq)
+                    seq = self.seq
+                    yield message
+                try:
+                    async with self.changed:
+                        await asyncio.wait_for(self.changed.wait_for(lambda: self.seq != seq), TournamentStreamHeartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.subscribers -= 1
+
+
+tournamentStream = TournamentStream()
+
+
+@app.get("/tournament/stream")
+async def streamTournament(request: Request):
+    return StreamingResponse(tournamentStream.subscribe(request), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/tournament/configurations", response_class=JSONResponse)
+async def tournamentConfigurationResults():
+    configurations = tournamentResults.snapshot()[3]
+    return [
+        {"n": n, "k": k, "w": w, "games": games, "scores": {displayName(f): s for f, s in points.items()}}
+        for (n, k, w), (games, points) in sorted(configurations.items())
+    ]
+
+
 @app.get("/tournamentDisplay", response_class=HTMLResponse)
-async def tournamentDisplay():
-    with open("html/tournament.html") as f:
-        return f.read()
+async def tournamentDisplay(request: Request):
+    return staticFiles["tournament"].response(request)
 
 
 @app.get("/favicon.ico")
-async def favicon():
-    def iterfile():
-        with open("assets/favicon.ico", mode="rb") as file_like:
-            yield from file_like
-
-    return StreamingResponse(iterfile(), media_type="ico")
+async def favicon(request: Request):
+    return staticFiles["favicon"].response(request)
 
 
 @app.post("/validatePW", response_class=JSONResponse)
@@ -536,9 +2765,8 @@ async def validatePW(wrapper: pwWrapper):
 
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin():
-    with open("html/admin.html") as f:
-        return f.read()
+async def admin(request: Request):
+    return staticFiles["admin"].response(request)
 
 
 def pwHash(pw):
@@ -549,14 +2777,7 @@ def saveTeams():
         json.dump(teams, f)
 
 def deleteTeamSubmissions(team):
-    paths = [
-        f"./executable-submissions/{team}",
-        f"./cpp-submissions/{team}.cpp",
-        f"./python-submissions/{team}.py",
-    ]
-    for p in paths:
-        if os.path.exists(p):
-            os.remove(p)
+    submissionRegistry.remove(team)
 
 class pwTeamWrapper(BaseModel):
     pw: str
@@ -595,6 +2816,11 @@ async def getTeams():
     return list(teams.keys())
 
 
+@app.get("/submissions", response_class=JSONResponse)
+async def getSubmissions():
+    return [s.info() for s in submissionRegistry.all()]
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=80)
 else: